@@ -0,0 +1,185 @@
+import time
+from collections import OrderedDict
+
+OPEN_STATUSES = ('pending', 'awaiting_custom_instruction')
+
+
+class ApprovalRecord:
+    """In-memory state of a single approval request."""
+
+    __slots__ = ('action', 'details', 'status', 'response', 'instruction', 'timestamp',
+                 'prompt_message_id', 'prompt_chat_id', 'batch_id', 'messages', 'pages', 'decided_by',
+                 'last_access')
+
+    def __init__(self, action: str, details: str = "", status: str = 'pending',
+                 response=None, instruction=None, timestamp=None, batch_id=None):
+        self.action = action
+        self.details = details
+        self.status = status
+        self.response = response
+        self.instruction = instruction
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.prompt_message_id = None
+        self.prompt_chat_id = None
+        self.batch_id = batch_id
+        # (chat_id, message_id) of each copy sent, so all can show the decision
+        self.messages = None
+        # Details split into pages on first display; never persisted
+        self.pages = None
+        # Name of whoever answered, shown on every copy of the request
+        self.decided_by = None
+        self.last_access = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in OPEN_STATUSES
+
+    def to_dict(self) -> dict:
+        """Return the record in the dict shape used by callers and the store."""
+        data = {
+            'action': self.action,
+            'details': self.details,
+            'status': self.status,
+            'response': self.response,
+            'timestamp': self.timestamp
+        }
+        if self.batch_id is not None:
+            data['batch_id'] = self.batch_id
+        if self.prompt_message_id is not None:
+            data['prompt_message_id'] = self.prompt_message_id
+        if self.prompt_chat_id is not None:
+            data['prompt_chat_id'] = self.prompt_chat_id
+        if self.messages:
+            data['messages'] = self.messages
+        if self.instruction is not None:
+            data['instruction'] = self.instruction
+        return data
+
+
+class ApprovalCache:
+    """Bounded cache of approval records.
+
+    Open requests (pending or awaiting a custom instruction) are kept until
+    they are decided and are never evicted. Up to max_size decided requests
+    are kept in LRU order; they are also dropped once they have not been
+    accessed for ttl seconds.
+
+    Requests awaiting a custom instruction are additionally indexed by the
+    chat and message_id of the prompt shown to the user, in the order they
+    started waiting, so incoming text can be routed without scanning the
+    cache.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._open = {}
+        self._resolved = OrderedDict()
+        self._awaiting = OrderedDict()
+        self._awaiting_by_message = {}
+
+    def __contains__(self, request_id: str) -> bool:
+        return request_id in self._open or request_id in self._resolved
+
+    def __len__(self) -> int:
+        return len(self._open) + len(self._resolved)
+
+    def get(self, request_id: str):
+        """Return the record for request_id, or None if it is not cached."""
+        record = self._open.get(request_id)
+        if record is None:
+            self._expire()
+            record = self._resolved.get(request_id)
+            if record is None:
+                return None
+            self._resolved.move_to_end(request_id)
+        record.last_access = time.monotonic()
+        return record
+
+    def put(self, request_id: str, record: ApprovalRecord):
+        """Add or replace a record, filed according to its status."""
+        self._open.pop(request_id, None)
+        self._resolved.pop(request_id, None)
+        self._forget_awaiting(request_id)
+        record.last_access = time.monotonic()
+        if record.is_open:
+            self._open[request_id] = record
+            if record.status == 'awaiting_custom_instruction':
+                self._add_awaiting(request_id, record.prompt_chat_id, record.prompt_message_id)
+        else:
+            self._resolved[request_id] = record
+            self._evict()
+
+    def resolve(self, request_id: str):
+        """Move a decided request into the evictable LRU section."""
+        record = self._open.pop(request_id, None)
+        if record is None:
+            return
+        self._forget_awaiting(request_id)
+        # Details are only needed while the request is shown to the user
+        record.details = None
+        record.last_access = time.monotonic()
+        self._resolved[request_id] = record
+        self._evict()
+
+    def discard(self, request_id: str):
+        """Forget a request entirely, open or not."""
+        self._open.pop(request_id, None)
+        self._resolved.pop(request_id, None)
+        self._forget_awaiting(request_id)
+
+    def open_items(self):
+        """Iterate over requests that are still waiting for the user."""
+        return self._open.items()
+
+    def await_instruction(self, request_id: str, chat_id=None, message_id=None):
+        """Index an open request as waiting for a custom instruction."""
+        record = self._open.get(request_id)
+        if record is None:
+            return
+        self._forget_awaiting(request_id)
+        record.prompt_chat_id = chat_id
+        record.prompt_message_id = message_id
+        self._add_awaiting(request_id, chat_id, message_id)
+
+    def find_awaiting_instruction(self, chat_id=None, reply_to_message_id=None):
+        """Return the request a free-text instruction from chat_id belongs to, or None.
+
+        A reply to a prompt message routes to that prompt's request; anything
+        else goes to the request that has been waiting longest in that chat.
+        Prompts saved without a chat match any chat.
+        """
+        if reply_to_message_id is not None:
+            request_id = (self._awaiting_by_message.get((chat_id, reply_to_message_id))
+                          or self._awaiting_by_message.get((None, reply_to_message_id)))
+            if request_id is not None:
+                return request_id
+        for request_id, (prompt_chat_id, _) in self._awaiting.items():
+            if prompt_chat_id is None or prompt_chat_id == chat_id:
+                return request_id
+        return None
+
+    def _add_awaiting(self, request_id: str, chat_id, message_id):
+        self._awaiting[request_id] = (chat_id, message_id)
+        if message_id is not None:
+            self._awaiting_by_message[(chat_id, message_id)] = request_id
+
+    def _forget_awaiting(self, request_id: str):
+        prompt = self._awaiting.pop(request_id, None)
+        if prompt is not None and prompt[1] is not None:
+            self._awaiting_by_message.pop(prompt, None)
+
+    def _expire(self):
+        if not self._resolved:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self._resolved:
+            request_id, record = next(iter(self._resolved.items()))
+            if record.last_access > cutoff:
+                break
+            del self._resolved[request_id]
+
+    def _evict(self):
+        self._expire()
+        while len(self._resolved) > self.max_size:
+            self._resolved.popitem(last=False)
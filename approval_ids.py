@@ -0,0 +1,44 @@
+import secrets
+
+# callback_data is "<op>:<request or batch ID>" ("p:<request ID>:<page>" for paging);
+# Telegram allows at most 64 bytes
+CALLBACK_DATA_LIMIT = 64
+
+CALLBACK_ACTIONS = {
+    'a': 'approve',
+    'd': 'deny',
+    's': 'suggest',
+    'A': 'approveall',
+    'p': 'page'
+}
+CALLBACK_OPS = {action: op for op, action in CALLBACK_ACTIONS.items()}
+
+# Buttons sent before the compact format, e.g. "approve_approval_1718000000000"
+LEGACY_PREFIXES = ('approveall_', 'approve_', 'deny_', 'suggest_')
+
+
+def new_request_id(prefix: str = 'approval') -> str:
+    """Random request ID; 64 bits, so IDs created at the same moment never collide.
+
+    Hex keeps IDs lowercase, so they survive being typed into a text command.
+    """
+    return f"{prefix}_{secrets.token_hex(8)}"
+
+
+def encode_callback_data(action: str, ref: str) -> str:
+    """Encode a button press as compact callback_data."""
+    data = f"{CALLBACK_OPS[action]}:{ref}"
+    if len(data.encode()) > CALLBACK_DATA_LIMIT:
+        raise ValueError(f"callback_data too long for Telegram: {data}")
+    return data
+
+
+def decode_callback_data(data: str):
+    """Return (action, ref) for callback_data, or None if it isn't ours."""
+    if len(data) > 2 and data[1] == ':':
+        action = CALLBACK_ACTIONS.get(data[0])
+        return (action, data[2:]) if action is not None else None
+    for prefix in LEGACY_PREFIXES:
+        if data.startswith(prefix):
+            return prefix[:-1], data[len(prefix):]
+    return None
@@ -0,0 +1,423 @@
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from approval_cache import OPEN_STATUSES
+
+# Statements are kept as module constants so sqlite3's statement cache
+# prepares each of them once per connection and reuses it afterwards.
+_CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS approval_responses (
+        request_id TEXT PRIMARY KEY,
+        action TEXT NOT NULL,
+        status TEXT NOT NULL,
+        instruction TEXT,
+        timestamp REAL NOT NULL,
+        details TEXT,
+        batch_id TEXT,
+        prompt_message_id INTEGER,
+        prompt_chat_id INTEGER,
+        messages TEXT
+    )
+'''
+# Columns added after the first release; older databases are upgraded in place
+_ADDED_COLUMNS = (
+    ('details', 'TEXT'),
+    ('batch_id', 'TEXT'),
+    ('prompt_message_id', 'INTEGER'),
+    ('prompt_chat_id', 'INTEGER'),
+    ('messages', 'TEXT'),
+)
+_CREATE_STATUS_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_status
+    ON approval_responses(status)
+'''
+_CREATE_BATCH_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_batch
+    ON approval_responses(batch_id)
+'''
+_COLUMNS = ('request_id, action, status, instruction, timestamp, details, batch_id, prompt_message_id, '
+            'prompt_chat_id, messages')
+_UPSERT = f'''
+    INSERT OR REPLACE INTO approval_responses ({_COLUMNS})
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SELECT_ONE = f'''
+    SELECT {_COLUMNS}
+    FROM approval_responses WHERE request_id = ?
+'''
+_SELECT_OPEN = f'''
+    SELECT {_COLUMNS}
+    FROM approval_responses WHERE status IN ('pending', 'awaiting_custom_instruction')
+    ORDER BY timestamp
+'''
+_DELETE = '''
+    DELETE FROM approval_responses WHERE request_id = ?
+'''
+_SELECT_BATCH = f'''
+    SELECT {_COLUMNS}
+    FROM approval_responses WHERE batch_id = ?
+'''
+
+_CREATE_OUTBOX = '''
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        priority TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        created REAL NOT NULL,
+        owner TEXT,
+        lease_until REAL
+    )
+'''
+_OUTBOX_ADDED_COLUMNS = (
+    ('owner', 'TEXT'),
+    ('lease_until', 'REAL'),
+)
+_INSERT_OUTBOX = '''
+    INSERT INTO outbox (priority, payload, created, owner, lease_until) VALUES (?, ?, ?, ?, ?)
+'''
+# Several server processes may share the database: each sends only the
+# entries it holds a lease on, taking over ones whose owner stopped renewing
+_CLAIM_OUTBOX = '''
+    UPDATE outbox SET owner = ?, lease_until = ?
+    WHERE owner = ? OR owner IS NULL OR lease_until < ?
+'''
+_SELECT_OUTBOX = '''
+    SELECT id, priority, payload FROM outbox WHERE owner = ? ORDER BY id
+'''
+_RELEASE_OUTBOX = '''
+    UPDATE outbox SET owner = NULL, lease_until = NULL WHERE owner = ?
+'''
+_DELETE_OUTBOX = '''
+    DELETE FROM outbox WHERE id = ?
+'''
+
+# SQLite's default limit on bound parameters in older builds is 999
+_SELECT_MANY_CHUNK = 900
+
+_STOP = object()
+_WAKE = object()
+
+
+class ApprovalStore:
+    """SQLite approval store owned by a single writer thread.
+
+    All database I/O happens on one long-lived WAL connection in a background
+    thread, so the event loop never waits on SQLite. Writes are buffered and
+    flushed in batches; rows that have not been flushed yet are still visible
+    to reads.
+
+    The same database also holds the outbox of messages waiting to be sent.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = 0.05):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._pending_writes = {}
+        self._pending_outbox_deletes = []
+        self._first_pending_at = None
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name="approval-store", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        """Open the connection and make sure the schema exists."""
+        try:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(_CREATE_TABLE)
+            existing = {row[1] for row in self._conn.execute('PRAGMA table_info(approval_responses)')}
+            for name, column_type in _ADDED_COLUMNS:
+                if name not in existing:
+                    self._conn.execute(f'ALTER TABLE approval_responses ADD COLUMN {name} {column_type}')
+            self._conn.execute(_CREATE_STATUS_INDEX)
+            self._conn.execute(_CREATE_BATCH_INDEX)
+            self._conn.execute(_CREATE_OUTBOX)
+            existing = {row[1] for row in self._conn.execute('PRAGMA table_info(outbox)')}
+            for name, column_type in _OUTBOX_ADDED_COLUMNS:
+                if name not in existing:
+                    self._conn.execute(f'ALTER TABLE outbox ADD COLUMN {name} {column_type}')
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database initialization error: {e}", file=sys.stderr)
+
+    def _run(self):
+        """Writer thread: run queued jobs and flush buffered writes."""
+        self._connect()
+        while True:
+            timeout = None
+            with self._lock:
+                if self._first_pending_at is not None:
+                    timeout = max(0.0, self._first_pending_at + self.flush_interval - time.monotonic())
+            try:
+                job = self._jobs.get(timeout=timeout)
+            except queue.Empty:
+                job = None
+
+            if job is _STOP:
+                self._flush_writes()
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                return
+            if job is not None and job is not _WAKE:
+                func, loop, future = job
+                try:
+                    result = func()
+                except Exception as e:
+                    loop.call_soon_threadsafe(_set_exception, future, e)
+                else:
+                    loop.call_soon_threadsafe(_set_result, future, result)
+
+            with self._lock:
+                due = (self._first_pending_at is not None
+                       and time.monotonic() - self._first_pending_at >= self.flush_interval)
+            if due:
+                self._flush_writes()
+
+    def _flush_writes(self):
+        """Write all buffered rows in a single transaction."""
+        with self._lock:
+            rows = list(self._pending_writes.values())
+            self._pending_writes.clear()
+            deletes = [(entry_id,) for entry_id in self._pending_outbox_deletes]
+            self._pending_outbox_deletes.clear()
+            self._first_pending_at = None
+        if not (rows or deletes) or self._conn is None:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(_UPSERT, rows)
+                self._conn.executemany(_DELETE_OUTBOX, deletes)
+        except sqlite3.Error as e:
+            print(f"Database save error: {e}", file=sys.stderr)
+
+    async def _submit(self, func):
+        """Run func on the writer thread and await its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._jobs.put((func, loop, future))
+        return await future
+
+    def save(self, request_id: str, data: dict):
+        """Queue a row for the next batched write. Never blocks on I/O."""
+        row = (
+            request_id,
+            data.get('action', ''),
+            data.get('status', ''),
+            data.get('instruction', ''),
+            data.get('timestamp', time.time()),
+            data.get('details'),
+            data.get('batch_id'),
+            data.get('prompt_message_id'),
+            data.get('prompt_chat_id'),
+            # (chat_id, message_id) of every copy of the request that was sent
+            json.dumps(data['messages']) if data.get('messages') else None
+        )
+        with self._lock:
+            self._pending_writes[request_id] = row
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Make sure the writer thread flushes buffered writes within flush_interval."""
+        with self._lock:
+            wake = self._first_pending_at is None
+            if wake:
+                self._first_pending_at = time.monotonic()
+        if wake:
+            self._jobs.put(_WAKE)
+
+    async def delete(self, request_ids: list):
+        """Remove requests, including writes that have not been flushed yet."""
+        with self._lock:
+            for request_id in request_ids:
+                self._pending_writes.pop(request_id, None)
+        def _delete():
+            if self._conn is None:
+                return
+            try:
+                with self._conn:
+                    self._conn.executemany(_DELETE, [(request_id,) for request_id in request_ids])
+            except sqlite3.Error as e:
+                print(f"Database delete error: {e}", file=sys.stderr)
+        await self._submit(_delete)
+
+    async def load(self, request_id: str) -> dict:
+        """Load a single approval response, including unflushed writes."""
+        with self._lock:
+            row = self._pending_writes.get(request_id)
+        if row is None:
+            row = await self._submit(lambda: self._select_one(request_id))
+        if row:
+            return _row_to_dict(row)
+        return {'status': 'not_found'}
+
+    async def load_many(self, request_ids: list) -> dict:
+        """Load several approval responses with one query, keyed by request ID.
+
+        IDs that are not stored map to {'status': 'not_found'}.
+        """
+        rows = {}
+        with self._lock:
+            for request_id in request_ids:
+                row = self._pending_writes.get(request_id)
+                if row is not None:
+                    rows[request_id] = row
+        missing = [request_id for request_id in dict.fromkeys(request_ids) if request_id not in rows]
+        if missing:
+            for row in await self._submit(lambda: self._select_many(missing)):
+                rows[row[0]] = row
+        return {
+            request_id: _row_to_dict(rows[request_id]) if request_id in rows else {'status': 'not_found'}
+            for request_id in request_ids
+        }
+
+    def _select_many(self, request_ids: list) -> list:
+        if self._conn is None:
+            return []
+        rows = []
+        try:
+            for start in range(0, len(request_ids), _SELECT_MANY_CHUNK):
+                chunk = request_ids[start:start + _SELECT_MANY_CHUNK]
+                query = (f'SELECT {_COLUMNS} FROM approval_responses '
+                         f'WHERE request_id IN ({",".join("?" * len(chunk))})')
+                rows.extend(self._conn.execute(query, chunk).fetchall())
+        except sqlite3.Error as e:
+            print(f"Database load error: {e}", file=sys.stderr)
+        return rows
+
+    async def load_open(self) -> dict:
+        """All requests still waiting for the user, keyed by request ID, oldest first."""
+        return await self._load_where(_SELECT_OPEN, (), lambda row: row[2] in OPEN_STATUSES)
+
+    async def load_batch(self, batch_id: str) -> dict:
+        """All requests belonging to a batch, keyed by request ID."""
+        return await self._load_where(_SELECT_BATCH, (batch_id,), lambda row: row[6] == batch_id)
+
+    async def _load_where(self, query: str, params: tuple, matches) -> dict:
+        """Run a multi-row query and overlay rows that are still buffered."""
+        def _select():
+            if self._conn is None:
+                return []
+            try:
+                return self._conn.execute(query, params).fetchall()
+            except sqlite3.Error as e:
+                print(f"Database load error: {e}", file=sys.stderr)
+                return []
+        rows = {row[0]: row for row in await self._submit(_select)}
+        with self._lock:
+            pending = list(self._pending_writes.values())
+        for row in pending:
+            if matches(row):
+                rows[row[0]] = row
+            else:
+                rows.pop(row[0], None)
+        return {request_id: _row_to_dict(row) for request_id, row in rows.items()}
+
+    def _select_one(self, request_id: str):
+        if self._conn is None:
+            return None
+        try:
+            return self._conn.execute(_SELECT_ONE, (request_id,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Database load error: {e}", file=sys.stderr)
+            return None
+
+    async def outbox_add(self, priority: str, payload: str, owner: str, lease: float) -> int:
+        """Durably append a message leased to owner and return its entry ID."""
+        def _insert():
+            now = time.time()
+            with self._conn:
+                return self._conn.execute(_INSERT_OUTBOX, (priority, payload, now, owner, now + lease)).lastrowid
+        return await self._submit(_insert)
+
+    async def outbox_claim(self, owner: str, lease: float) -> list:
+        """Renew owner's lease, take over unowned or expired entries, and return
+        every entry owner now holds as (id, priority, payload), oldest first."""
+        with self._lock:
+            deleted = set(self._pending_outbox_deletes)
+        def _claim():
+            if self._conn is None:
+                return []
+            now = time.time()
+            try:
+                with self._conn:
+                    self._conn.execute(_CLAIM_OUTBOX, (owner, now + lease, owner, now))
+                return self._conn.execute(_SELECT_OUTBOX, (owner,)).fetchall()
+            except sqlite3.Error as e:
+                print(f"Outbox claim error: {e}", file=sys.stderr)
+                return []
+        return [row for row in await self._submit(_claim) if row[0] not in deleted]
+
+    async def outbox_release(self, owner: str):
+        """Give up owner's undelivered entries so another process can send them now."""
+        def _release():
+            if self._conn is None:
+                return
+            self._flush_writes()
+            with self._conn:
+                self._conn.execute(_RELEASE_OUTBOX, (owner,))
+        await self._submit(_release)
+
+    def outbox_remove(self, entry_id: int):
+        """Drop a delivered entry with the next batched write. Never blocks on I/O."""
+        with self._lock:
+            self._pending_outbox_deletes.append(entry_id)
+        self._schedule_flush()
+
+    async def flush(self):
+        """Write buffered rows now and wait until they are committed."""
+        await self._submit(self._flush_writes)
+
+    async def reset(self):
+        """Drop all stored responses and recreate the database file."""
+        def _reset():
+            with self._lock:
+                self._pending_writes.clear()
+                self._pending_outbox_deletes.clear()
+                self._first_pending_at = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.db_path + suffix):
+                    os.remove(self.db_path + suffix)
+            self._connect()
+        await self._submit(_reset)
+
+    def close(self):
+        """Flush outstanding writes and stop the writer thread."""
+        if self._thread.is_alive():
+            self._jobs.put(_STOP)
+            self._thread.join()
+
+
+def _row_to_dict(row) -> dict:
+    return {
+        'action': row[1],
+        'status': row[2],
+        'instruction': row[3],
+        'timestamp': row[4],
+        'details': row[5],
+        'batch_id': row[6],
+        'prompt_message_id': row[7],
+        'prompt_chat_id': row[8],
+        'messages': [tuple(message) for message in json.loads(row[9])] if row[9] else None
+    }
+
+
+def _set_result(future, result):
+    if not future.cancelled():
+        future.set_result(result)
+
+
+def _set_exception(future, exc):
+    if not future.cancelled():
+        future.set_exception(exc)
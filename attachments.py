@@ -0,0 +1,90 @@
+import gzip
+import os
+from digest import MESSAGE_LIMIT
+
+# sendMediaGroup takes at most this many documents per message
+MEDIA_GROUP_SIZE = 10
+# Telegram's caption limit for documents
+CAPTION_LIMIT = 1024
+# Log tails are read backwards from the end of the file in blocks of this size
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def check_files(paths: list, max_bytes: int) -> list:
+    """Return (path, size) for each file, or raise ValueError naming the first
+    one that cannot be sent."""
+    files = []
+    for path in paths:
+        try:
+            size = os.stat(path).st_size
+        except OSError as e:
+            raise ValueError(f"Cannot read {path}: {e.strerror}")
+        if not os.path.isfile(path):
+            raise ValueError(f"Not a regular file: {path}")
+        if size == 0:
+            raise ValueError(f"File is empty: {path}")
+        if size > max_bytes:
+            raise ValueError(f"{path} is {size / 1024 / 1024:.1f} MB; the upload limit is "
+                             f"{max_bytes / 1024 / 1024:.0f} MB")
+        files.append((path, size))
+    return files
+
+
+def media_groups(files: list) -> list:
+    """Split files into sendMediaGroup-sized groups."""
+    return [files[start:start + MEDIA_GROUP_SIZE] for start in range(0, len(files), MEDIA_GROUP_SIZE)]
+
+
+def read_tail(path: str, lines: int, max_bytes: int) -> str:
+    """Return the last `lines` lines of a file.
+
+    Only the end of the file is read, a block at a time, and never more than
+    max_bytes of it, so tailing a multi-gigabyte log costs the same as
+    tailing a small one.
+    """
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        blocks = []
+        newlines = 0
+        # One extra newline: the last line usually ends with one
+        while position > 0 and newlines <= lines and end - position < max_bytes:
+            size = min(TAIL_BLOCK_SIZE, position, max_bytes - (end - position))
+            position -= size
+            f.seek(position)
+            block = f.read(size)
+            blocks.append(block)
+            newlines += block.count(b'\n')
+    data = b''.join(reversed(blocks))
+    text = data.decode('utf-8', errors='replace').rstrip('\n')
+    tail = text.split('\n')[-lines:]
+    if position > 0 and len(tail) == len(text.split('\n')):
+        # Cut off by max_bytes mid-line; drop the partial first line
+        tail = tail[1:]
+    return '\n'.join(tail)
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT) -> list:
+    """Split text into messages of at most `limit` characters, breaking
+    between lines where possible."""
+    pages = []
+    current = ''
+    for line in text.split('\n'):
+        # A single oversized line is cut into limit-sized pieces
+        pieces = [line[start:start + limit] for start in range(0, len(line), limit)] or ['']
+        for piece in pieces:
+            if not current:
+                current = piece
+            elif len(current) + 1 + len(piece) > limit:
+                pages.append(current)
+                current = piece
+            else:
+                current = f"{current}\n{piece}"
+    if current or not pages:
+        pages.append(current)
+    return pages
+
+
+def gzip_text(text: str) -> bytes:
+    """Compress text for sending as an attachment."""
+    return gzip.compress(text.encode('utf-8'), compresslevel=6)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Local broker daemon that owns the bot's polling loop and approval store.
+
+Telegram allows a single getUpdates consumer per bot token, so when several
+MCP server processes share one bot they talk to this daemon over a Unix
+socket instead of polling themselves. The protocol is newline-delimited
+JSON:
+
+    request:  {"id": 1, "method": "send_notification", "params": {...}}
+    response: {"id": 1, "result": ...} or {"id": 1, "error": "...", "type": "..."}
+    event:    {"event": "decided", "request_id": "...", "status": {...}}
+
+Clients subscribe to their own request IDs and receive a "decided" event as
+soon as the user answers.
+"""
+import asyncio
+import fcntl
+import json
+import os
+import secrets
+import signal
+import subprocess
+import sys
+from telegram.error import TelegramError
+from approval_cache import OPEN_STATUSES
+from config import BROKER_SOCKET, METRICS_PORT, PROFILE_DIR
+from metrics import serve_metrics
+
+# TelegramService coroutines clients are allowed to call through the broker
+BROKER_METHODS = {
+    'send_progress',
+    'send_notification',
+    'send_files',
+    'send_log_tail',
+    'create_approval_request',
+    'create_approval_batch',
+    'get_approval_status',
+    'get_approval_statuses',
+    'get_server_stats',
+}
+
+CONNECT_TIMEOUT = 10
+
+
+class BrokerError(Exception):
+    """Error raised by the broker while running a client call."""
+
+
+class ApprovalBroker:
+    """Serve one TelegramService to many MCP server processes."""
+
+    def __init__(self, socket_path: str = BROKER_SOCKET):
+        from telegram_service import TelegramService
+        self.socket_path = socket_path
+        self.telegram = TelegramService()
+        self._server = None
+        self._lock_file = None
+
+    def _acquire_lock(self) -> bool:
+        """Make sure only one broker runs per socket path."""
+        self._lock_file = open(self.socket_path + '.lock', 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+        return True
+
+    async def serve(self):
+        """Start polling and serve clients until cancelled."""
+        if not self._acquire_lock():
+            print(f"Broker already running on {self.socket_path}", file=sys.stderr)
+            return
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        await self.telegram._ensure_listening()
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        # The broker owns the bot, so it serves the Bot API and approval metrics
+        metrics_server = await serve_metrics(METRICS_PORT) if METRICS_PORT else None
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            if metrics_server is not None:
+                metrics_server.close()
+            await self.telegram.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    async def _handle_client(self, reader, writer):
+        """Serve one connected MCP server process."""
+        tasks = set()
+        write_lock = asyncio.Lock()
+
+        async def send(message: dict):
+            async with write_lock:
+                writer.write(json.dumps(message).encode() + b'\n')
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self._handle_message(json.loads(line), send))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError) as e:
+            print(f"Broker client error: {e}", file=sys.stderr)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _handle_message(self, message: dict, send):
+        call_id = message.get('id')
+        method = message.get('method')
+        params = message.get('params', {})
+        try:
+            if method == 'subscribe':
+                await send({'id': call_id, 'result': True})
+                status = await self.telegram.wait_for_approval(params['request_id'], None)
+                await send({'event': 'decided', 'request_id': params['request_id'], 'status': status})
+                return
+            if method not in BROKER_METHODS:
+                raise BrokerError(f"Unknown broker method: {method}")
+            result = await getattr(self.telegram, method)(**params)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await send({'id': call_id, 'error': str(e), 'type': type(e).__name__,
+                        'telegram': isinstance(e, TelegramError)})
+        else:
+            await send({'id': call_id, 'result': result})
+
+
+class BrokerClient:
+    """Drop-in replacement for TelegramService that forwards to the broker.
+
+    Connects lazily and starts the broker daemon on first use if it is not
+    running yet.
+    """
+
+    def __init__(self, socket_path: str = BROKER_SOCKET):
+        self.socket_path = socket_path
+        # Prefixes this process's progress task IDs in the broker's shared updater
+        self.client_id = secrets.token_hex(4)
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._connect_lock = asyncio.Lock()
+        self._next_id = 0
+        self._calls = {}
+        self._approval_waiters = {}
+
+    async def _connect(self):
+        """Connect to the broker, starting it if needed."""
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                self._start_broker()
+                self._reader, self._writer = await self._wait_for_broker()
+            self._reader_task = asyncio.create_task(self._read_loop())
+
+    def _start_broker(self):
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self.socket_path],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+
+    async def _wait_for_broker(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CONNECT_TIMEOUT
+        while True:
+            try:
+                return await asyncio.open_unix_connection(self.socket_path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if loop.time() > deadline:
+                    raise BrokerError(f"Broker did not start on {self.socket_path}")
+                await asyncio.sleep(0.1)
+
+    async def _read_loop(self):
+        """Dispatch responses and events coming from the broker."""
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if 'event' in message:
+                    waiter = self._approval_waiters.pop(message['request_id'], None)
+                    if waiter is not None and not waiter.done():
+                        waiter.set_result(message['status'])
+                    continue
+                future = self._calls.pop(message['id'], None)
+                if future is None or future.done():
+                    continue
+                if 'error' in message:
+                    error_type = TelegramError if message.get('telegram') else BrokerError
+                    future.set_exception(error_type(message['error']))
+                else:
+                    future.set_result(message['result'])
+        finally:
+            self._writer = None
+            error = BrokerError("Lost connection to broker")
+            for future in list(self._calls.values()) + list(self._approval_waiters.values()):
+                if not future.done():
+                    future.set_exception(error)
+            self._calls.clear()
+            self._approval_waiters.clear()
+
+    async def _call(self, method: str, **params):
+        await self._connect()
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._calls[self._next_id] = future
+        message = {'id': self._next_id, 'method': method, 'params': params}
+        self._writer.write(json.dumps(message).encode() + b'\n')
+        await self._writer.drain()
+        return await future
+
+    async def send_progress(self, message: str, status: str, task_id: str = None) -> str:
+        if task_id:
+            # Processes sharing the broker must not edit each other's progress messages
+            task_id = f"{self.client_id}:{task_id}"
+        return await self._call('send_progress', message=message, status=status, task_id=task_id)
+
+    async def send_notification(self, message: str, priority: str = "normal") -> str:
+        return await self._call('send_notification', message=message, priority=priority)
+
+    async def send_files(self, paths: list, caption: str = "") -> str:
+        return await self._call('send_files', paths=paths, caption=caption)
+
+    async def send_log_tail(self, path: str, lines: int = 100, caption: str = "") -> str:
+        return await self._call('send_log_tail', path=path, lines=lines, caption=caption)
+
+    async def create_approval_request(self, action: str, details: str = "") -> str:
+        return await self._call('create_approval_request', action=action, details=details)
+
+    async def create_approval_batch(self, actions: list, details: str = "") -> dict:
+        return await self._call('create_approval_batch', actions=actions, details=details)
+
+    async def get_approval_status(self, request_id: str) -> dict:
+        return await self._call('get_approval_status', request_id=request_id)
+
+    async def get_approval_statuses(self, request_ids: list) -> dict:
+        return await self._call('get_approval_statuses', request_ids=request_ids)
+
+    async def get_server_stats(self):
+        return await self._call('get_server_stats')
+
+    async def wait_for_approval(self, request_id: str, timeout: float) -> dict:
+        """Wait for the broker to report a decision or the timeout to expire."""
+        status = await self.get_approval_status(request_id)
+        if status['status'] not in OPEN_STATUSES:
+            return status
+
+        waiter = self._approval_waiters.get(request_id)
+        if waiter is None:
+            waiter = asyncio.get_running_loop().create_future()
+            self._approval_waiters[request_id] = waiter
+            await self._call('subscribe', request_id=request_id)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            return await self.get_approval_status(request_id)
+
+    async def resume(self):
+        """Nothing to do: the broker daemon restores pending work when it starts."""
+
+    async def close(self):
+        """Disconnect from the broker; the daemon keeps running."""
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+
+async def main(socket_path: str):
+    """Run the broker until interrupted or terminated."""
+    task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    if PROFILE_DIR:
+        from profiling import profiler
+        profiler.start()
+    try:
+        await ApprovalBroker(socket_path).serve()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if PROFILE_DIR:
+            await profiler.stop()
+
+
+if __name__ == "__main__":
+    socket_path = sys.argv[1] if len(sys.argv) > 1 else BROKER_SOCKET
+    try:
+        asyncio.run(main(socket_path))
+    except KeyboardInterrupt:
+        pass
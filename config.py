@@ -1,4 +1,6 @@
 import os
+import secrets
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -18,10 +20,120 @@ def get_env_var(var_name: str, var_type=str):
     
     return value
 
+def get_optional_env_var(var_name: str, default, var_type=str):
+    """Get optional environment variable, falling back to a default."""
+    value = os.getenv(var_name)
+    if not value:
+        return default
+    
+    if var_type in (int, float):
+        try:
+            return var_type(value)
+        except ValueError:
+            raise ValueError(f"{var_name} must be a valid {var_type.__name__}")
+    
+    return value
+
 # Load configuration
 TOKEN = get_env_var('TELEGRAM_BOT_TOKEN')
 CHAT_ID = get_env_var('TELEGRAM_CHAT_ID', int)
 
+# Bot API endpoint; override to point the bot at a local test server
+API_BASE_URL = get_optional_env_var('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot')
+
+# SQLite database holding approval responses
+DB_PATH = get_optional_env_var(
+    'TELEGRAM_DB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'approval_responses.db')
+)
+
+# In-memory approval cache limits (decided requests only; open requests are never evicted)
+APPROVAL_CACHE_SIZE = get_optional_env_var('TELEGRAM_APPROVAL_CACHE_SIZE', 1000, int)
+APPROVAL_CACHE_TTL = get_optional_env_var('TELEGRAM_APPROVAL_CACHE_TTL', 3600, float)
+
+# Outbound rate limits (messages per second; 0 disables a limit)
+RATE_LIMIT_GLOBAL = get_optional_env_var('TELEGRAM_RATE_LIMIT_GLOBAL', 30, float)
+RATE_LIMIT_PER_CHAT = get_optional_env_var('TELEGRAM_RATE_LIMIT_PER_CHAT', 1, float)
+RATE_LIMIT_CHAT_BURST = get_optional_env_var('TELEGRAM_RATE_LIMIT_CHAT_BURST', 3, float)
+
+# Minimum seconds between in-place edits of a task's progress message
+PROGRESS_EDIT_INTERVAL = get_optional_env_var('TELEGRAM_PROGRESS_EDIT_INTERVAL', 3, float)
+# Progress tasks that never complete are forgotten after this many seconds
+# without an update, and least recently updated first beyond PROGRESS_MAX_TASKS
+PROGRESS_TASK_TTL = get_optional_env_var('TELEGRAM_PROGRESS_TASK_TTL', 3600, float)
+PROGRESS_MAX_TASKS = get_optional_env_var('TELEGRAM_PROGRESS_MAX_TASKS', 1000, int)
+
+# Digest mode: combine low and normal notifications into one message per chat.
+# Buffered notifications are flushed after DIGEST_INTERVAL seconds (0 disables digests)
+# or as soon as DIGEST_MAX_ITEMS distinct ones are waiting.
+DIGEST_INTERVAL = get_optional_env_var('TELEGRAM_DIGEST_INTERVAL', 0, float)
+DIGEST_MAX_ITEMS = get_optional_env_var('TELEGRAM_DIGEST_MAX_ITEMS', 50, int)
+DIGEST_PRIORITIES = ('low', 'normal')
+
+# HTTP connections to the Bot API. Sends share one keep-alive pool; long polls get their own.
+HTTP_POOL_SIZE = get_optional_env_var('TELEGRAM_HTTP_POOL_SIZE', 8, int)
+HTTP_KEEPALIVE = get_optional_env_var('TELEGRAM_HTTP_KEEPALIVE', 60, float)
+# 'auto' uses HTTP/2 when the h2 package is installed, else HTTP/1.1
+HTTP_VERSION = get_optional_env_var('TELEGRAM_HTTP_VERSION', 'auto').lower()
+
+# Auto-approval policy: JSON rules checked before an approval request goes to Telegram
+POLICY_FILE = get_optional_env_var('TELEGRAM_POLICY_FILE', '')
+
+# Multi-chat routing: JSON rules sending approvals and notifications to further chats by kind,
+# priority or action prefix. Unset, everything goes to TELEGRAM_CHAT_ID.
+ROUTES_FILE = get_optional_env_var('TELEGRAM_ROUTES_FILE', '')
+
+# Formatting of progress updates and approval messages: HTML or MarkdownV2
+PARSE_MODE = get_optional_env_var('TELEGRAM_PARSE_MODE', 'HTML')
+
+# Attachments: the Bot API accepts uploads up to 50 MB (2000 MB with a local Bot API server).
+# Text needing more than TEXT_MAX_PAGES messages is sent as a compressed attachment instead.
+MAX_UPLOAD_MB = get_optional_env_var('TELEGRAM_MAX_UPLOAD_MB', 50, float)
+TEXT_MAX_PAGES = get_optional_env_var('TELEGRAM_TEXT_MAX_PAGES', 3, int)
+# Most a log tail reads from the end of a file, however many lines are asked for
+LOG_TAIL_MAX_BYTES = get_optional_env_var('TELEGRAM_LOG_TAIL_MAX_KB', 1024, int) * 1024
+
+# Instrumentation: tool and Bot API latency histograms, error counters and queue gauges.
+# Off by default; TELEGRAM_METRICS_PORT also serves them to Prometheus on 127.0.0.1.
+METRICS_PORT = get_optional_env_var('TELEGRAM_METRICS_PORT', 0, int)
+METRICS_ENABLED = get_optional_env_var('TELEGRAM_METRICS', 'false').lower() in ('1', 'true', 'yes') or METRICS_PORT > 0
+
+# Profiling: set TELEGRAM_PROFILE_DIR to log slow calls and event loop stalls there.
+# One call in PROFILE_SAMPLE runs under cProfile (0 disables it); PROFILE_KEEP caps saved files.
+PROFILE_DIR = get_optional_env_var('TELEGRAM_PROFILE_DIR', '')
+PROFILE_SLOW_MS = get_optional_env_var('TELEGRAM_PROFILE_SLOW_MS', 1000, float)
+PROFILE_SAMPLE = get_optional_env_var('TELEGRAM_PROFILE_SAMPLE', 10, int)
+PROFILE_LAG_MS = get_optional_env_var('TELEGRAM_PROFILE_LAG_MS', 100, float)
+PROFILE_TRACEMALLOC = get_optional_env_var('TELEGRAM_PROFILE_TRACEMALLOC', 'false').lower() in ('1', 'true', 'yes')
+PROFILE_SNAPSHOT_INTERVAL = get_optional_env_var('TELEGRAM_PROFILE_SNAPSHOT_INTERVAL', 600, float)
+PROFILE_KEEP = get_optional_env_var('TELEGRAM_PROFILE_KEEP', 50, int)
+
+# MCP transport: 'stdio' (one server per agent) or 'http' (streamable HTTP; many agents share one server)
+MCP_TRANSPORT = get_optional_env_var('TELEGRAM_MCP_TRANSPORT', 'stdio').lower()
+MCP_HTTP_HOST = get_optional_env_var('TELEGRAM_MCP_HOST', '127.0.0.1')
+MCP_HTTP_PORT = get_optional_env_var('TELEGRAM_MCP_PORT', 8765, int)
+
+# Shared broker: one daemon per bot token owns polling and the approval store
+BROKER_ENABLED = get_optional_env_var('TELEGRAM_BROKER', 'false').lower() in ('1', 'true', 'yes')
+BROKER_SOCKET = get_optional_env_var(
+    'TELEGRAM_BROKER_SOCKET',
+    os.path.join(tempfile.gettempdir(), f"telegram-mcp-{TOKEN.split(':')[0]}.sock")
+)
+
+# Webhook mode: receive updates on a local HTTP endpoint instead of long polling.
+# Enabled when TELEGRAM_WEBHOOK_URL (the public URL Telegram posts to) is set.
+WEBHOOK_URL = get_optional_env_var('TELEGRAM_WEBHOOK_URL', '')
+WEBHOOK_LISTEN = get_optional_env_var('TELEGRAM_WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = get_optional_env_var('TELEGRAM_WEBHOOK_PORT', 8443, int)
+WEBHOOK_PATH = get_optional_env_var('TELEGRAM_WEBHOOK_PATH', 'telegram')
+WEBHOOK_SECRET = get_optional_env_var('TELEGRAM_WEBHOOK_SECRET', '') or secrets.token_urlsafe(32)
+
+# Only these update types are handled, so don't ask Telegram for anything else
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+# Two buttons per item plus "approve all" stays well inside Telegram's keyboard limits
+MAX_BATCH_SIZE = 20
+
 # Message formatting constants
 STATUS_EMOJIS = {
     "started": "🚀",
@@ -0,0 +1,104 @@
+import asyncio
+import sys
+
+# Telegram rejects messages longer than this
+MESSAGE_LIMIT = 4096
+
+
+class _ChatDigest:
+    __slots__ = ('counts', 'size', 'flush')
+
+    def __init__(self):
+        self.counts = {}
+        self.size = 0
+        self.flush = None
+
+
+class NotificationDigest:
+    """Buffers routine notifications per chat and sends them combined.
+
+    A chat's buffer is flushed `interval` seconds after its first entry, or
+    straight away once it holds `max_items` distinct notifications or enough
+    text to fill a whole message. Identical notifications are sent once with
+    a repeat count. Digests longer than Telegram's limit are split into
+    several messages.
+
+    Buffered notifications live only in memory: close() sends them on a
+    clean shutdown, but a crash loses up to one interval's worth. They reach
+    the durable outbox when the digest is sent.
+
+    send is an async callable taking (chat_id, text).
+    """
+
+    def __init__(self, send, interval: float = 60.0, max_items: int = 50):
+        self._send = send
+        self.interval = interval
+        self.max_items = max_items
+        self._chats = {}
+
+    def __len__(self) -> int:
+        return sum(sum(chat.counts.values()) for chat in self._chats.values())
+
+    def add(self, chat_id, text: str):
+        """Buffer a notification for chat_id."""
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _ChatDigest()
+        if text in chat.counts:
+            chat.counts[text] += 1
+        else:
+            chat.counts[text] = 1
+            chat.size += len(text) + 1
+
+        if len(chat.counts) >= self.max_items or chat.size >= MESSAGE_LIMIT:
+            self._schedule(chat_id, chat, 0)
+        elif chat.flush is None:
+            self._schedule(chat_id, chat, self.interval)
+
+    async def close(self):
+        """Send everything still buffered."""
+        for chat_id in list(self._chats):
+            chat = self._chats[chat_id]
+            if chat.flush is not None:
+                chat.flush.cancel()
+            await self._flush(chat_id, 0)
+
+    def _schedule(self, chat_id, chat: _ChatDigest, delay: float):
+        if chat.flush is not None:
+            if delay:
+                return
+            chat.flush.cancel()
+        chat.flush = asyncio.create_task(self._flush(chat_id, delay))
+
+    async def _flush(self, chat_id, delay: float):
+        await asyncio.sleep(delay)
+        chat = self._chats.pop(chat_id, None)
+        if chat is None or not chat.counts:
+            return
+        for text in self.render(chat.counts):
+            try:
+                await self._send(chat_id, text)
+            except Exception as e:
+                print(f"Digest send error: {e}", file=sys.stderr)
+
+    @staticmethod
+    def render(counts: dict) -> list:
+        """Combine notifications into as few messages as fit Telegram's limit."""
+        total = sum(counts.values())
+        header = f"🗞 Digest: {total} notification{'s' if total != 1 else ''}"
+        pieces = []
+        for text, count in counts.items():
+            line = text if count == 1 else f"{text} (×{count})"
+            # A single oversized notification is cut into limit-sized pieces
+            pieces.extend(line[start:start + MESSAGE_LIMIT] for start in range(0, len(line), MESSAGE_LIMIT))
+
+        messages = []
+        current = header
+        for piece in pieces:
+            if len(current) + 1 + len(piece) > MESSAGE_LIMIT:
+                messages.append(current)
+                current = piece
+            else:
+                current = f"{current}\n{piece}"
+        messages.append(current)
+        return messages
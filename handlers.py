@@ -1,42 +1,144 @@
 import asyncio
+import json
+import os
+import sys
 import time
 from typing import Any
 from mcp.types import TextContent
-from telegram.error import TelegramError
-from telegram_service import TelegramService
+from approval_cache import OPEN_STATUSES
+from config import BROKER_ENABLED, MAX_BATCH_SIZE, POLICY_FILE, PROFILE_DIR
+from metrics import metrics
+
+DECISION_EMOJIS = {
+    'approved': '✅',
+    'denied': '❌',
+    'denied_custom': '❌'
+}
+
+
+def _waits_for_user(name: str, arguments: dict) -> bool:
+    """Whether a tool call may block until someone answers in Telegram."""
+    if name in ("request_approval", "request_approvals_batch"):
+        return arguments.get("wait_for_response", True)
+    return name == "check_approval_status" and bool(arguments.get("wait_seconds"))
+
 
 class ToolHandler:
     def __init__(self):
-        self.telegram = TelegramService()
+        self._telegram = None
+        self._policy = None
+        self._policy_reports = set()
+        # Request IDs this handler may see; None means all of them
+        self._owned_requests = None
+        self.session_id = None
+        if PROFILE_DIR:
+            # Shadow the method so every tool call is timed (and sampled) by the profiler
+            from profiling import profiler
+            self.handle_tool_call = profiler.wrap(
+                self.handle_tool_call,
+                lambda name, arguments: None if _waits_for_user(name, arguments) else f"tool {name}"
+            )
+
+    @property
+    def telegram(self):
+        """Telegram backend, imported and built on the first tool call.
+
+        Keeps python-telegram-bot and SQLite out of server startup, so the MCP
+        handshake and list_tools don't wait for them.
+        """
+        if self._telegram is None:
+            if BROKER_ENABLED:
+                # Another process owns polling; talk to it over its Unix socket
+                from broker import BrokerClient
+                self._telegram = BrokerClient()
+            else:
+                from telegram_service import TelegramService
+                self._telegram = TelegramService()
+            if PROFILE_DIR:
+                # Calls waiting for the user aren't profiled; sending their request still is
+                from profiling import profiler
+                telegram = self._telegram
+                telegram.create_approval_request = profiler.wrap(
+                    telegram.create_approval_request, lambda *args, **kwargs: "tool request_approval (send)")
+                telegram.create_approval_batch = profiler.wrap(
+                    telegram.create_approval_batch, lambda *args, **kwargs: "tool request_approvals_batch (send)")
+        return self._telegram
+
+    @property
+    def policy(self):
+        """Auto-approval rules from TELEGRAM_POLICY_FILE, loaded on first use; None when unset."""
+        if self._policy is None and POLICY_FILE:
+            from policy import ApprovalPolicy
+            self._policy = ApprovalPolicy.load(POLICY_FILE)
+        return self._policy
+
+    async def resume(self):
+        """Resume messages and approvals left pending by a previous run."""
+        await self.telegram.resume()
+
+    async def close(self):
+        """Release the Telegram connection and flush pending state."""
+        if self._policy_reports:
+            await asyncio.gather(*self._policy_reports, return_exceptions=True)
+        if self._telegram is not None:
+            await self._telegram.close()
 
     async def handle_tool_call(self, name: str, arguments: dict[str, Any]) -> list[TextContent]:
         """Route tool calls to appropriate handlers."""
+        from telegram.error import TelegramError
+        start = time.perf_counter()
         try:
             if name == "notify_progress":
                 return await self._handle_progress(arguments)
             elif name == "request_approval":
                 return await self._handle_approval(arguments)
+            elif name == "request_approvals_batch":
+                return await self._handle_approval_batch(arguments)
             elif name == "send_notification":
                 return await self._handle_notification(arguments)
+            elif name == "send_file":
+                return await self._handle_send_file(arguments)
+            elif name == "send_log_tail":
+                return await self._handle_log_tail(arguments)
             elif name == "check_approval_status":
                 return await self._handle_check_status(arguments)
+            elif name == "get_server_stats":
+                return await self._handle_server_stats(arguments)
             else:
                 raise ValueError(f"Unknown tool: {name}")
         except TelegramError as e:
+            if metrics is not None:
+                metrics.tool_errors.inc(name)
             return [TextContent(type="text", text=f"Telegram error: {str(e)}")]
         except Exception as e:
+            if metrics is not None:
+                metrics.tool_errors.inc(name)
             return [TextContent(type="text", text=f"Error: {str(e)}")]
+        finally:
+            if metrics is not None:
+                metrics.tool_duration.observe(name, time.perf_counter() - start)
 
     async def _handle_progress(self, args: dict[str, Any]) -> list[TextContent]:
         """Handle progress notification."""
+        task_id = args.get("task_id")
+        if task_id and self.session_id:
+            # Sessions sharing a server must not edit each other's progress messages
+            task_id = f"{self.session_id}:{task_id}"
         result = await self.telegram.send_progress(
             message=args["message"],
-            status=args["status"]
+            status=args["status"],
+            task_id=task_id
         )
         return [TextContent(type="text", text=result)]
 
     async def _handle_approval(self, args: dict[str, Any]) -> list[TextContent]:
         """Handle approval request and wait for response."""
+        policy = self.policy
+        if policy is not None:
+            rule = policy.evaluate(args["action"], args.get("details", ""))
+            if rule is not None and rule.decision != "escalate":
+                return self._apply_policy_decision(rule, args["action"])
+
         # Check if we should wait for response
         wait_for_response = args.get("wait_for_response", True)
         
@@ -46,33 +148,20 @@ class ToolHandler:
                 action=args["action"],
                 details=args.get("details", "")
             )
+            self._claim([request_id])
             
-            # Poll for response with extended timeout for realistic user response times
+            # Wait for the user's response with extended timeout for realistic response times
             timeout = args.get("timeout", 1800)  # 30 minutes default
-            start_time = time.time()
-            check_interval = 5  # Check every 5 seconds instead of 2
-            
-            while time.time() - start_time < timeout:
-                status = self.telegram.get_approval_status(request_id)
-                
-                if status['status'] == 'approved':
-                    return [TextContent(type="text", text=f"✅ User approved: {args['action']}")]
-                elif status['status'] == 'denied':
-                    return [TextContent(type="text", text=f"❌ User denied: {args['action']}")]
-                elif status['status'] == 'denied_custom':
-                    # Handle custom instruction denial
-                    instruction = status.get('instruction', 'Simple denial - no specific instructions provided')
-                    return [TextContent(type="text", text=f"❌ User denied with custom instructions: {args['action']}\n\n{instruction}")]
-                elif status['status'] == 'awaiting_custom_instruction':
-                    # Still waiting for user to provide custom instruction - don't timeout yet
-                    await asyncio.sleep(check_interval)
-                    continue
-                elif status['status'] == 'pending':
-                    # Wait before checking again
-                    await asyncio.sleep(check_interval)
-                else:
-                    # Unknown status
-                    break
+            status = await self.telegram.wait_for_approval(request_id, timeout)
+
+            if status['status'] == 'approved':
+                return [TextContent(type="text", text=f"✅ User approved: {args['action']}")]
+            elif status['status'] == 'denied':
+                return [TextContent(type="text", text=f"❌ User denied: {args['action']}")]
+            elif status['status'] == 'denied_custom':
+                # Handle custom instruction denial
+                instruction = status.get('instruction', 'Simple denial - no specific instructions provided')
+                return [TextContent(type="text", text=f"❌ User denied with custom instructions: {args['action']}\n\n{instruction}")]
             
             # Timeout - but keep the request active in database for later response
             return [TextContent(type="text", text=f"⏳ Approval request is still pending for: {args['action']} (ID: {request_id})\n\nThe request remains active and you can still respond via Telegram. Use this request ID to check status later.")]
@@ -82,8 +171,108 @@ class ToolHandler:
                 action=args["action"],
                 details=args.get("details", "")
             )
+            self._claim([request_id])
             return [TextContent(type="text", text=f"Approval request sent (ID: {request_id})")]
 
+    def _apply_policy_decision(self, rule, action: str) -> list[TextContent]:
+        """Answer an approval request from a policy rule without asking the user."""
+        status = 'approved' if rule.decision == 'approve' else 'denied'
+        emoji = DECISION_EMOJIS[status]
+        # The user still hears about it, as a low-priority (digestible) notification
+        report = asyncio.create_task(self._report_policy_decision(
+            f"🤖 {emoji} Auto-{status} by policy rule '{rule.name}': {action}"
+        ))
+        self._policy_reports.add(report)
+        report.add_done_callback(self._policy_reports.discard)
+        return [TextContent(type="text", text=f"{emoji} Auto-{status} by policy rule '{rule.name}': {action}")]
+
+    async def _report_policy_decision(self, message: str):
+        try:
+            await self.telegram.send_notification(message=message, priority="low")
+        except Exception as e:
+            print(f"Policy report error: {e}", file=sys.stderr)
+
+    async def _handle_approval_batch(self, args: dict[str, Any]) -> list[TextContent]:
+        """Handle a batch of approval requests sent as one message."""
+        actions = args["actions"]
+        # Checked first, so an empty list isn't reported as a bad quorum
+        if not actions:
+            raise ValueError("At least one action is required")
+        if len(actions) > MAX_BATCH_SIZE:
+            raise ValueError(f"A batch can hold at most {MAX_BATCH_SIZE} actions, not {len(actions)}")
+        mode = args.get("mode", "all")
+        if mode not in ("all", "any", "quorum"):
+            raise ValueError(f"Unknown batch mode: {mode}")
+        quorum = args.get("quorum") or len(actions) // 2 + 1
+        if mode == "quorum" and not 1 <= quorum <= len(actions):
+            raise ValueError(f"Quorum must be between 1 and {len(actions)}")
+
+        batch = await self.telegram.create_approval_batch(actions=actions, details=args.get("details", ""))
+        self._claim(batch['request_ids'])
+        request_ids = batch['request_ids']
+        if not args.get("wait_for_response", True):
+            ids = "\n".join(f"{index}. {action} (ID: {request_id})"
+                             for index, (action, request_id) in enumerate(zip(actions, request_ids), 1))
+            return [TextContent(type="text", text=f"Batch approval request sent (ID: {batch['batch_id']})\n\n{ids}")]
+
+        statuses = await self._wait_for_batch(request_ids, args.get("timeout", 1800), mode, quorum)
+        approved = sum(1 for status in statuses if status['status'] == 'approved')
+        denied = sum(1 for status in statuses if status['status'] in ('denied', 'denied_custom'))
+        pending = len(statuses) - approved - denied
+        summary = f"{approved} approved, {denied} denied, {pending} pending"
+        if mode == "quorum":
+            summary += f" (quorum of {quorum} {'met' if approved >= quorum else 'not met'})"
+
+        lines = []
+        for index, (action, request_id, status) in enumerate(zip(actions, request_ids, statuses), 1):
+            emoji = DECISION_EMOJIS.get(status['status'], '⏳')
+            lines.append(f"{emoji} {index}. {action} (ID: {request_id})")
+        text = f"Batch approval {batch['batch_id']}: {summary}\n\n" + "\n".join(lines)
+        if pending:
+            text += "\n\nPending actions remain active; use their IDs to check status later."
+        return [TextContent(type="text", text=text)]
+
+    async def _wait_for_batch(self, request_ids: list, timeout: float, mode: str, quorum: int) -> list[dict]:
+        """Wait on every request of a batch until the mode is satisfied or the timeout expires."""
+        waits = {asyncio.create_task(self.telegram.wait_for_approval(request_id, timeout)): request_id
+                 for request_id in request_ids}
+        decided = {}
+        pending = set(waits)
+        try:
+            while pending and not self._batch_satisfied(decided, len(request_ids), mode, quorum):
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                timed_out = False
+                for task in done:
+                    status = task.result()
+                    if status['status'] in OPEN_STATUSES:
+                        # All waits share one deadline, so one timing out means they all have
+                        timed_out = True
+                    else:
+                        decided[waits[task]] = status
+                if timed_out:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        statuses = []
+        for request_id in request_ids:
+            status = decided.get(request_id)
+            if status is None:
+                status = await self.telegram.get_approval_status(request_id)
+            statuses.append(status)
+        return statuses
+
+    @staticmethod
+    def _batch_satisfied(decided: dict, total: int, mode: str, quorum: int) -> bool:
+        if mode == "any":
+            return len(decided) > 0
+        if mode == "quorum":
+            approved = sum(1 for status in decided.values() if status['status'] == 'approved')
+            # Done once the quorum is reached or too many denials make it unreachable
+            return approved >= quorum or total - (len(decided) - approved) < quorum
+        return len(decided) == total
+
     async def _handle_notification(self, args: dict[str, Any]) -> list[TextContent]:
         """Handle general notification."""
         result = await self.telegram.send_notification(
@@ -92,23 +281,125 @@ class ToolHandler:
         )
         return [TextContent(type="text", text=result)]
 
+    async def _handle_send_file(self, args: dict[str, Any]) -> list[TextContent]:
+        """Handle sending one or more files as documents."""
+        paths = list(args.get("paths") or [])
+        if args.get("path"):
+            paths.insert(0, args["path"])
+        if not paths:
+            raise ValueError("path or paths is required")
+        result = await self.telegram.send_files(
+            paths=[self._resolve_path(path) for path in dict.fromkeys(paths)],
+            caption=args.get("caption", "")
+        )
+        return [TextContent(type="text", text=result)]
+
+    async def _handle_log_tail(self, args: dict[str, Any]) -> list[TextContent]:
+        """Handle sending the end of a log file."""
+        result = await self.telegram.send_log_tail(
+            path=self._resolve_path(args["path"]),
+            lines=args.get("lines", 100),
+            caption=args.get("caption", "")
+        )
+        return [TextContent(type="text", text=result)]
+
+    @staticmethod
+    def _resolve_path(path: str) -> str:
+        """Absolute path, so a broker daemon with another working directory finds the same file."""
+        return os.path.abspath(os.path.expanduser(path))
+
     async def _handle_check_status(self, args: dict[str, Any]) -> list[TextContent]:
-        """Handle checking approval status by request ID."""
-        request_id = args["request_id"]
-        status = self.telegram.get_approval_status(request_id)
-        
+        """Handle checking approval status by one or more request IDs."""
+        request_ids = list(args.get("request_ids") or [])
+        if args.get("request_id"):
+            request_ids.insert(0, args["request_id"])
+        request_ids = list(dict.fromkeys(request_ids))
+        if not request_ids:
+            raise ValueError("request_id or request_ids is required")
+
+        statuses = await self._get_statuses(request_ids)
+        wait_seconds = args.get("wait_seconds", 0)
+        open_ids = [request_id for request_id in request_ids if statuses[request_id]['status'] in OPEN_STATUSES]
+        if wait_seconds and open_ids:
+            await self._wait_for_any(open_ids, wait_seconds)
+            statuses = await self._get_statuses(request_ids)
+
+        return [TextContent(type="text", text="\n\n".join(
+            self._format_status(request_id, statuses[request_id]) for request_id in request_ids
+        ))]
+
+    async def _get_statuses(self, request_ids: list) -> dict:
+        """Statuses keyed by request ID; other sessions' requests read as not found."""
+        statuses = {request_id: {'status': 'not_found'} for request_id in request_ids}
+        visible = [request_id for request_id in request_ids
+                   if self._owned_requests is None or request_id in self._owned_requests]
+        if visible:
+            statuses.update(await self.telegram.get_approval_statuses(visible))
+        return statuses
+
+    def _claim(self, request_ids: list):
+        """Record requests created through this handler."""
+        if self._owned_requests is not None:
+            self._owned_requests.update(request_ids)
+
+    async def _wait_for_any(self, request_ids: list, timeout: float):
+        """Return once any of the requests is decided or the timeout expires."""
+        waits = [asyncio.create_task(self.telegram.wait_for_approval(request_id, None))
+                 for request_id in request_ids]
+        try:
+            await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in waits:
+                task.cancel()
+
+    async def _handle_server_stats(self, args: dict[str, Any]) -> list[TextContent]:
+        """Report this server's metrics (and the broker's, when one is used)."""
+        if metrics is None:
+            return [TextContent(type="text", text="Metrics are disabled. Set TELEGRAM_METRICS=true to enable them.")]
+        stats = metrics.snapshot()
+        if BROKER_ENABLED:
+            # Bot API calls and approvals are handled by the broker daemon
+            stats['broker'] = await self.telegram.get_server_stats()
+        return [TextContent(type="text", text=json.dumps(stats, indent=2, ensure_ascii=False))]
+
+    @staticmethod
+    def _format_status(request_id: str, status: dict) -> str:
+        """Describe one request's status for the agent."""
         if status['status'] == 'not_found':
-            return [TextContent(type="text", text=f"❓ No approval request found with ID: {request_id}")]
+            return f"❓ No approval request found with ID: {request_id}"
         elif status['status'] == 'pending':
-            return [TextContent(type="text", text=f"⏳ Approval request '{status.get('action', 'Unknown')}' is still pending (ID: {request_id})")]
+            return f"⏳ Approval request '{status.get('action', 'Unknown')}' is still pending (ID: {request_id})"
         elif status['status'] == 'awaiting_custom_instruction':
-            return [TextContent(type="text", text=f"⏳ Waiting for custom instruction for '{status.get('action', 'Unknown')}' (ID: {request_id})")]
+            return f"⏳ Waiting for custom instruction for '{status.get('action', 'Unknown')}' (ID: {request_id})"
         elif status['status'] == 'approved':
-            return [TextContent(type="text", text=f"✅ Request '{status.get('action', 'Unknown')}' was approved (ID: {request_id})")]
+            return f"✅ Request '{status.get('action', 'Unknown')}' was approved (ID: {request_id})"
         elif status['status'] == 'denied':
-            return [TextContent(type="text", text=f"❌ Request '{status.get('action', 'Unknown')}' was denied (ID: {request_id})")]
+            return f"❌ Request '{status.get('action', 'Unknown')}' was denied (ID: {request_id})"
         elif status['status'] == 'denied_custom':
             instruction = status.get('instruction', 'No specific instructions')
-            return [TextContent(type="text", text=f"❌ Request '{status.get('action', 'Unknown')}' was denied with custom instructions (ID: {request_id}):\n\n{instruction}")]
+            return f"❌ Request '{status.get('action', 'Unknown')}' was denied with custom instructions (ID: {request_id}):\n\n{instruction}"
         else:
-            return [TextContent(type="text", text=f"❓ Unknown status '{status['status']}' for request ID: {request_id}")]
+            return f"❓ Unknown status '{status['status']}' for request ID: {request_id}"
+
+
+class SessionToolHandler(ToolHandler):
+    """Tool handler for one client session of a shared (HTTP) server.
+
+    Uses the shared handler's Telegram backend and policy, but only sees the
+    approval requests it created itself, and namespaces progress task IDs, so
+    concurrent agents can't read or edit each other's requests.
+    """
+
+    def __init__(self, shared: ToolHandler, session_id: str):
+        super().__init__()
+        self._shared = shared
+        self._owned_requests = set()
+        self.session_id = session_id
+
+    @property
+    def telegram(self):
+        return self._shared.telegram
+
+    @property
+    def policy(self):
+        return self._shared.policy
@@ -0,0 +1,62 @@
+import importlib.util
+import time
+import httpx
+from telegram.request import HTTPXRequest
+from config import HTTP_POOL_SIZE, HTTP_KEEPALIVE, HTTP_VERSION
+from metrics import metrics
+
+# Seconds a send may wait for a free pooled connection before failing
+POOL_TIMEOUT = 30.0
+
+
+def http_version() -> str:
+    """HTTP version to speak to the Bot API, resolving 'auto' by whether h2 is installed."""
+    if HTTP_VERSION == 'auto':
+        return '2' if importlib.util.find_spec('h2') is not None else '1.1'
+    return HTTP_VERSION
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records the time and outcome of every Bot API call."""
+
+    async def do_request(self, url: str, method: str, request_data=None, *args, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        start = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, request_data, *args, **kwargs)
+        except Exception:
+            metrics.api_errors.inc(api_method)
+            raise
+        finally:
+            metrics.api_duration.observe(api_method, time.perf_counter() - start)
+        if code == 429:
+            metrics.api_flood.inc(api_method)
+        elif code >= 400:
+            metrics.api_errors.inc(api_method)
+        return code, payload
+
+
+def create_request(pool_size: int) -> HTTPXRequest:
+    """Build a keep-alive HTTPXRequest holding up to `pool_size` connections."""
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=HTTP_KEEPALIVE
+    )
+    # Only pay for timing calls when metrics are enabled
+    request_class = InstrumentedRequest if metrics is not None else HTTPXRequest
+    return request_class(
+        connection_pool_size=pool_size,
+        pool_timeout=POOL_TIMEOUT,
+        http_version=http_version(),
+        httpx_kwargs={'limits': limits}
+    )
+
+
+def create_bot_requests() -> tuple[HTTPXRequest, HTTPXRequest]:
+    """Return (request, get_updates_request) for a Bot.
+
+    getUpdates holds its connection for the whole long poll, so it gets a
+    dedicated single-connection pool and can never starve outgoing messages.
+    """
+    return create_request(HTTP_POOL_SIZE), create_request(1)
@@ -1,17 +1,26 @@
 #!/usr/bin/env python3
 
 import asyncio
+import contextlib
+import secrets
+import signal
+import sys
+import weakref
 from typing import Any
 from mcp.server import Server
 from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
 from mcp.types import ServerCapabilities
-from handlers import ToolHandler
+from config import BROKER_ENABLED, METRICS_PORT, PROFILE_DIR, MCP_TRANSPORT, MCP_HTTP_HOST, MCP_HTTP_PORT
+from handlers import ToolHandler, SessionToolHandler
+from metrics import serve_metrics
 from tools import get_tools
 
 # Create MCP server
 server = Server("telegram-messenger")
 handler = ToolHandler()
+# HTTP sessions get their own handler on top of the shared one; dropped when the session goes away
+session_handlers = weakref.WeakKeyDictionary()
 
 @server.list_tools()
 async def list_tools():
@@ -21,10 +30,31 @@ async def list_tools():
 @server.call_tool()
 async def call_tool(name: str, arguments: dict[str, Any]):
     """Handle tool calls."""
-    return await handler.handle_tool_call(name, arguments)
+    return await current_handler().handle_tool_call(name, arguments)
 
-async def main():
-    # Run the server using stdio transport
+def current_handler() -> ToolHandler:
+    """The handler for the session making the current request."""
+    if MCP_TRANSPORT != "http":
+        return handler
+    session = server.request_context.session
+    session_handler = session_handlers.get(session)
+    if session_handler is None:
+        session_handler = session_handlers[session] = SessionToolHandler(handler, secrets.token_hex(4))
+    return session_handler
+
+# Seconds after startup before pending work from a previous run is resumed,
+# so the MCP handshake isn't held up by loading python-telegram-bot
+RESUME_DELAY = 2
+
+async def resume_pending_work():
+    await asyncio.sleep(RESUME_DELAY)
+    try:
+        await handler.resume()
+    except Exception as e:
+        print(f"Resume error: {e}", file=sys.stderr)
+
+async def run_stdio():
+    """Serve a single agent over stdin/stdout."""
     async with stdio_server() as (read_stream, write_stream):
         await server.run(
             read_stream,
@@ -38,5 +68,47 @@ async def main():
             )
         )
 
+async def run_http():
+    """Serve any number of agents over streamable HTTP at /mcp, sharing one Telegram connection."""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+    session_manager = StreamableHTTPSessionManager(app=server)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with session_manager.run():
+            yield
+
+    app = Starlette(routes=[Mount("/mcp", app=session_manager.handle_request)], lifespan=lifespan)
+    config = uvicorn.Config(app, host=MCP_HTTP_HOST, port=MCP_HTTP_PORT, log_level="warning")
+    # uvicorn shuts down gracefully on SIGINT/SIGTERM, then re-raises the signal through the
+    # handlers it replaced; make those no-ops so main() still closes the Telegram service
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: None)
+    await uvicorn.Server(config).serve()
+
+async def main():
+    resume_task = asyncio.create_task(resume_pending_work())
+    # With the broker, the daemon owns the bot and serves the endpoint instead
+    metrics_server = await serve_metrics(METRICS_PORT) if METRICS_PORT and not BROKER_ENABLED else None
+    if PROFILE_DIR:
+        from profiling import profiler
+        profiler.start()
+    try:
+        if MCP_TRANSPORT == "http":
+            await run_http()
+        else:
+            await run_stdio()
+    finally:
+        resume_task.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+        await handler.close()
+        if PROFILE_DIR:
+            await profiler.stop()
+
 if __name__ == "__main__":
     asyncio.run(main())
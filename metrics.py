@@ -0,0 +1,195 @@
+import asyncio
+import sys
+import time
+from bisect import bisect_left
+from config import METRICS_ENABLED
+
+# Histogram bucket upper bounds in seconds. Tool calls include request_approval
+# waiting for a human, so the latency buckets run up to its 30 minute timeout.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+DECISION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+
+class _Series:
+    __slots__ = ('counts', 'total')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+
+
+class Histogram:
+    """Prometheus-style histogram with one label."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: tuple):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, label_value: str, value: float):
+        series = self._series.get(label_value)
+        if series is None:
+            # One slot per bucket plus the +Inf overflow
+            series = self._series[label_value] = _Series(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.total += value
+
+    def summary(self, scale: float = 1.0) -> dict:
+        """Count, mean and p50/p99 per label; percentiles are bucket upper bounds."""
+        result = {}
+        for label_value, series in self._series.items():
+            count = sum(series.counts)
+            result[label_value] = {
+                'count': count,
+                'mean': round(series.total / count * scale, 3),
+                'p50': self._quantile(series.counts, count, 0.5, scale),
+                'p99': self._quantile(series.counts, count, 0.99, scale)
+            }
+        return result
+
+    def _quantile(self, counts: list, count: int, q: float, scale: float):
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= q * count:
+                return round(bound * scale, 3)
+        # Above the largest bucket
+        return None
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_value, series in self._series.items():
+            label = f'{self.label}="{_escape_label(label_value)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series.counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += series.counts[-1]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {series.total}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter with one label."""
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.values = {}
+
+    def inc(self, label_value: str):
+        self.values[label_value] = self.values.get(label_value, 0) + 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_value, value in self.values.items():
+            lines.append(f'{self.name}{{{self.label}="{_escape_label(label_value)}"}} {value}')
+        return lines
+
+
+class Metrics:
+    """In-process registry for tool, Bot API and approval metrics.
+
+    Histograms and counters are updated where things happen; gauges are
+    callables registered by their owner and read only when metrics are
+    rendered, so keeping them costs nothing between scrapes.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.tool_duration = Histogram('telegram_mcp_tool_duration_seconds',
+                                       'Time to answer an MCP tool call', 'tool', LATENCY_BUCKETS)
+        self.tool_errors = Counter('telegram_mcp_tool_errors_total',
+                                   'MCP tool calls that returned an error', 'tool')
+        self.api_duration = Histogram('telegram_mcp_bot_api_duration_seconds',
+                                      'Time of a Bot API HTTP call', 'method', LATENCY_BUCKETS)
+        self.api_errors = Counter('telegram_mcp_bot_api_errors_total',
+                                  'Bot API calls that failed or returned an error status', 'method')
+        self.api_flood = Counter('telegram_mcp_bot_api_flood_total',
+                                 'Bot API calls rejected with 429 Too Many Requests', 'method')
+        self.decision_time = Histogram('telegram_mcp_approval_decision_seconds',
+                                       'Time from an approval request to the human decision', 'decision',
+                                       DECISION_BUCKETS)
+        self._gauges = {}
+
+    def gauge(self, name: str, help_text: str, read):
+        """Register a gauge; read is a zero-argument callable returning its value."""
+        self._gauges[name] = (help_text, read)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines = [
+            "# HELP telegram_mcp_uptime_seconds Seconds since the server started",
+            "# TYPE telegram_mcp_uptime_seconds gauge",
+            f"telegram_mcp_uptime_seconds {time.monotonic() - self.started:.3f}"
+        ]
+        for name, (help_text, read) in self._gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        for metric in (self.tool_duration, self.tool_errors, self.api_duration, self.api_errors,
+                       self.api_flood, self.decision_time):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Summarise the metrics as a JSON-friendly dict."""
+        tools = self.tool_duration.summary(scale=1000)
+        for tool, summary in tools.items():
+            summary['errors'] = self.tool_errors.values.get(tool, 0)
+        bot_api = self.api_duration.summary(scale=1000)
+        for method, summary in bot_api.items():
+            summary['errors'] = self.api_errors.values.get(method, 0)
+            summary['flood_429'] = self.api_flood.values.get(method, 0)
+        return {
+            'uptime_seconds': round(time.monotonic() - self.started, 1),
+            'gauges': {name.removeprefix('telegram_mcp_'): read() for name, (_, read) in self._gauges.items()},
+            'tools_ms': tools,
+            'bot_api_ms': bot_api,
+            'approval_decision_seconds': self.decision_time.summary()
+        }
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+async def serve_metrics(port: int, host: str = '127.0.0.1'):
+    """Serve metrics.render() over HTTP on a local port for Prometheus to scrape.
+
+    Returns the asyncio server, or None if the port could not be bound.
+    """
+
+    async def handle(reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 10)
+            # Skip the headers; nothing in them changes the response
+            while await asyncio.wait_for(reader.readline(), 10) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.split()
+            if len(parts) >= 2 and parts[0] == b'GET' and parts[1].split(b'?')[0] in (b'/', b'/metrics'):
+                status, body = '200 OK', metrics.render().encode()
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    try:
+        return await asyncio.start_server(handle, host, port)
+    except OSError as e:
+        print(f"Metrics endpoint error: {e}", file=sys.stderr)
+        return None
+
+
+# None when instrumentation is disabled; call sites check before recording
+metrics = Metrics() if METRICS_ENABLED else None
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from collections import deque
+from datetime import timedelta
+from telegram.error import RetryAfter
+from config import PRIORITY_EMOJIS
+
+# Lane 0 is served first: urgent, high, normal, low
+PRIORITY_LANES = {priority: lane for lane, priority in enumerate(reversed(list(PRIORITY_EMOJIS)))}
+DEFAULT_LANE = PRIORITY_LANES["normal"]
+
+
+class TokenBucket:
+    """Classic token bucket. A rate of 0 disables the limit."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'paused_until')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if not self.rate:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate:
+            self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given time (flood wait)."""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+        self.updated = now
+
+
+class _Job:
+    __slots__ = ('chat_id', 'call', 'future', 'attempts')
+
+    def __init__(self, chat_id, call, future):
+        self.chat_id = chat_id
+        self.call = call
+        self.future = future
+        self.attempts = 0
+
+
+class OutboundDispatcher:
+    """Single outbound queue for Bot API calls.
+
+    Calls are served from priority lanes (urgent first) and only go out when
+    both the global bucket and the target chat's bucket have a token. A
+    RetryAfter from Telegram pauses that chat's bucket and puts the call back
+    at the front of its lane. At most `max_in_flight` calls run at once (0 for
+    no limit), so the backlog waits here in priority order instead of in the
+    HTTP client's first-come connection pool.
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 max_retries: int = 5, max_in_flight: int = 0):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_in_flight = max_in_flight
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}
+        self._lanes = [deque() for _ in PRIORITY_LANES]
+        self._wakeup = asyncio.Event()
+        self._worker = None
+        self._in_flight = set()
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    async def submit(self, chat_id, priority: str, call):
+        """Queue call (a zero-argument coroutine factory) and return its result."""
+        future = asyncio.get_running_loop().create_future()
+        lane = PRIORITY_LANES.get(priority, DEFAULT_LANE)
+        self._lanes[lane].append(_Job(chat_id, call, future))
+        self._ensure_worker()
+        self._wakeup.set()
+        return await future
+
+    async def close(self):
+        """Stop the worker; queued calls that have not been sent are cancelled."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for lane in self._lanes:
+            while lane:
+                lane.popleft().future.cancel()
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _run(self):
+        """Hand queued jobs to the API as fast as the buckets allow."""
+        while True:
+            self._wakeup.clear()
+            delay = self._dispatch_ready()
+            if delay == 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch_ready(self):
+        """Start the highest-priority sendable job.
+
+        Returns 0 if a job was started, otherwise how long to sleep before
+        something can be sent (None if the queue is empty or every slot is busy).
+        """
+        if self.max_in_flight and len(self._in_flight) >= self.max_in_flight:
+            return None
+        now = time.monotonic()
+        global_wait = self._global.wait_time(now)
+        delay = None
+        for lane in self._lanes:
+            for job in lane:
+                if job.future.done():
+                    lane.remove(job)
+                    return 0
+                wait = self._chat_bucket(job.chat_id).wait_time(now)
+                if wait == 0 and global_wait == 0:
+                    lane.remove(job)
+                    self._global.take()
+                    self._chat_bucket(job.chat_id).take()
+                    task = asyncio.create_task(self._send(job, lane))
+                    self._in_flight.add(task)
+                    task.add_done_callback(self._in_flight.discard)
+                    return 0
+                wait = max(wait, global_wait)
+                delay = wait if delay is None else min(delay, wait)
+        return delay
+
+    async def _send(self, job: _Job, lane: deque):
+        job.attempts += 1
+        try:
+            result = await job.call()
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            if job.attempts > self.max_retries:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                return
+            self._chat_bucket(job.chat_id).pause(retry_after)
+            lane.appendleft(job)
+            self._wakeup.set()
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            # Free the slot before waking the worker so it can start the next job
+            self._in_flight.discard(asyncio.current_task())
+            self._wakeup.set()
@@ -0,0 +1,165 @@
+import asyncio
+import heapq
+import json
+import random
+import sys
+import uuid
+from telegram.error import BadRequest, Forbidden, InvalidToken, NetworkError, RetryAfter
+from outbound import DEFAULT_LANE, PRIORITY_LANES
+
+
+class Outbox:
+    """Durable, ordered queue of outgoing messages.
+
+    put() stores the message in SQLite and returns without waiting for
+    Telegram. Each chat has its own lane with its own background sender:
+    within a chat entries are delivered one at a time, higher priorities
+    first and oldest first within a priority, while different chats are
+    served concurrently. An entry is removed from the database once it has
+    been sent. A transient failure (network error, timeout, exhausted flood
+    retries) puts the entry back in its lane and retries with exponential
+    backoff, so nothing is lost or reordered within its priority and other
+    chats are not held up; entries left over from a previous run are sent
+    before new ones of the same priority.
+
+    Server processes sharing the database each send only the entries they
+    hold a lease on: their own, plus any that were never claimed or whose
+    owner stopped renewing for `lease` seconds (it crashed). The lease is
+    renewed while entries are pending and released on close.
+
+    send is an async callable taking (priority, **message_kwargs); the
+    kwargs must include chat_id.
+    """
+
+    def __init__(self, store, send, base_delay: float = 1.0, max_delay: float = 300.0, lease: float = 60.0):
+        self._store = store
+        self._send = send
+        self.owner = uuid.uuid4().hex
+        self.lease = lease
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lanes = {}
+        self._senders = {}
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._loading = None
+        self._queued = set()
+        self._renewing = None
+        self._claims = 0
+        self._sent_while_claiming = set()
+
+    def __len__(self) -> int:
+        return self._pending
+
+    async def start(self):
+        """Load entries left over from a previous run and start sending them."""
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._claim())
+        await asyncio.shield(self._loading)
+
+    async def _claim(self):
+        self._claims += 1
+        try:
+            entries = await self._store.outbox_claim(self.owner, self.lease)
+        finally:
+            self._claims -= 1
+        # Entries delivered while the query ran may still be in its result
+        sent = self._sent_while_claiming
+        if not self._claims:
+            self._sent_while_claiming = set()
+        for entry_id, priority, payload in entries:
+            if entry_id not in self._queued and entry_id not in sent:
+                self._enqueue((entry_id, priority, json.loads(payload)))
+
+    async def _renew(self):
+        """Keep the lease on pending entries alive, picking up orphaned ones too."""
+        while self._pending:
+            await asyncio.sleep(self.lease / 3)
+            await self._claim()
+        self._renewing = None
+
+    async def put(self, priority: str, **kwargs):
+        """Store a message for delivery and return as soon as it is durable."""
+        await self.start()
+        entry_id = await self._store.outbox_add(priority, json.dumps(kwargs), self.owner, self.lease)
+        self._enqueue((entry_id, priority, kwargs))
+
+    async def join(self):
+        """Wait until every queued message has been delivered or dropped."""
+        await self._idle.wait()
+
+    async def close(self):
+        """Stop the senders; undelivered entries stay in the database, released
+        for whichever process starts its outbox next."""
+        senders = list(self._senders.values())
+        if self._renewing is not None:
+            senders.append(self._renewing)
+        for sender in senders:
+            sender.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+        self._senders.clear()
+        self._lanes.clear()
+        self._queued.clear()
+        self._renewing = None
+        self._pending = 0
+        self._idle.set()
+        self._loading = None
+        await self._store.outbox_release(self.owner)
+
+    def _enqueue(self, entry: tuple):
+        entry_id, priority, kwargs = entry
+        chat_id = kwargs.get('chat_id')
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = []
+        # Entry IDs grow with every put, so they keep each priority in order
+        heapq.heappush(lane, (PRIORITY_LANES.get(priority, DEFAULT_LANE), entry_id, priority, kwargs))
+        self._queued.add(entry_id)
+        self._pending += 1
+        self._idle.clear()
+        if self._renewing is None:
+            self._renewing = asyncio.create_task(self._renew())
+        if chat_id not in self._senders:
+            self._senders[chat_id] = asyncio.create_task(self._run(chat_id, lane))
+
+    async def _run(self, chat_id, lane: list):
+        failures = 0
+        try:
+            while lane:
+                item = heapq.heappop(lane)
+                _, entry_id, priority, kwargs = item
+                try:
+                    await self._send(priority, **kwargs)
+                except Exception as e:
+                    if self._is_transient(e):
+                        failures += 1
+                        delay = min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+                        # Back in the lane, so a more urgent entry queued meanwhile goes first
+                        heapq.heappush(lane, item)
+                        print(f"Outbox send failed ({e}); retrying in {delay:.1f}s", file=sys.stderr)
+                        # Jitter keeps several servers sharing a bot from retrying in lockstep
+                        await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+                        continue
+                    print(f"Outbox dropped undeliverable message: {e}", file=sys.stderr)
+                failures = 0
+                self._queued.discard(entry_id)
+                if self._claims:
+                    self._sent_while_claiming.add(entry_id)
+                self._pending -= 1
+                self._store.outbox_remove(entry_id)
+        finally:
+            if self._senders.get(chat_id) is asyncio.current_task():
+                # The lane is empty (or closing); the next put starts a new sender
+                del self._senders[chat_id]
+                if not lane:
+                    self._lanes.pop(chat_id, None)
+            if not self._pending:
+                self._idle.set()
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        # BadRequest is a NetworkError subclass but will fail the same way every time
+        if isinstance(error, (BadRequest, Forbidden, InvalidToken)):
+            return False
+        return isinstance(error, (NetworkError, RetryAfter, OSError))
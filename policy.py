@@ -0,0 +1,137 @@
+import json
+import re
+
+DECISIONS = ('approve', 'deny', 'escalate')
+
+_REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+_QUANTIFIERS = set('*+?{')
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Literal text every match of a '^'-anchored pattern starts with ('' if unknown)."""
+    if not pattern.startswith('^') or '|' in pattern:
+        return ''
+    end = 1
+    while end < len(pattern) and pattern[end] not in _REGEX_SPECIAL:
+        end += 1
+    if end < len(pattern) and pattern[end] in _QUANTIFIERS:
+        # The quantifier applies to the last character, which may repeat zero times
+        end -= 1
+    return pattern[1:end]
+
+
+class PolicyRule:
+    """One rule: every condition it sets must match for its decision to apply."""
+    __slots__ = ('index', 'name', 'decision', 'prefixes', 'action_pattern', 'details_pattern')
+
+    def __init__(self, index: int, name: str, decision: str, prefixes: tuple,
+                 action_pattern=None, details_pattern=None):
+        self.index = index
+        self.name = name
+        self.decision = decision
+        self.prefixes = prefixes
+        self.action_pattern = action_pattern
+        self.details_pattern = details_pattern
+
+    def matches(self, action: str, details: str) -> bool:
+        """Check the regex conditions; prefixes are checked by the index."""
+        if self.action_pattern is not None and self.action_pattern.search(action) is None:
+            return False
+        if self.details_pattern is not None and self.details_pattern.search(details) is None:
+            return False
+        return True
+
+
+class ApprovalPolicy:
+    """Auto-approval rules evaluated before an approval request reaches Telegram.
+
+    Rules are checked in file order and the first one that matches decides:
+    approve or deny answers the agent straight away, escalate sends the
+    request to Telegram as usual. Requests no rule matches are escalated.
+
+    Rules with an action_prefix, or an action_pattern anchored with '^' that
+    starts with literal text, are indexed by that prefix, so evaluation only
+    looks up the action's own prefixes instead of trying every rule. Regexes
+    are compiled once when the policy is loaded.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = [self._parse_rule(index, rule) for index, rule in enumerate(rules)]
+        self._by_prefix = {}
+        self._unprefixed = []
+        for rule in self.rules:
+            if rule.prefixes:
+                for prefix in rule.prefixes:
+                    self._by_prefix.setdefault(prefix, []).append(rule)
+            else:
+                self._unprefixed.append(rule)
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._by_prefix})
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @classmethod
+    def load(cls, path: str) -> 'ApprovalPolicy':
+        """Load rules from a JSON file: {"rules": [{...}, ...]}."""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Could not load approval policy {path}: {e}")
+        if not isinstance(data, dict) or not isinstance(data.get('rules'), list):
+            raise ValueError(f"Approval policy {path} must be an object with a 'rules' list")
+        return cls(data['rules'])
+
+    def evaluate(self, action: str, details: str = '') -> PolicyRule | None:
+        """Return the first rule matching the request, or None if none does."""
+        matched = None
+        for length in self._prefix_lengths:
+            if length > len(action):
+                break
+            for rule in self._by_prefix.get(action[:length], ()):
+                if matched is not None and rule.index > matched.index:
+                    break
+                if rule.matches(action, details):
+                    matched = rule
+                    break
+        for rule in self._unprefixed:
+            if matched is not None and rule.index > matched.index:
+                break
+            if rule.matches(action, details):
+                return rule
+        return matched
+
+    @staticmethod
+    def _parse_rule(index: int, rule: dict) -> PolicyRule:
+        if not isinstance(rule, dict):
+            raise ValueError(f"Policy rule {index + 1} must be an object")
+        name = str(rule.get('name') or f"rule {index + 1}")
+        decision = rule.get('decision')
+        if decision not in DECISIONS:
+            raise ValueError(f"Policy rule '{name}' needs a decision of {', '.join(DECISIONS)}")
+
+        prefixes = rule.get('action_prefix') or ()
+        if isinstance(prefixes, str):
+            prefixes = (prefixes,)
+        prefixes = tuple(prefixes)
+        if not all(isinstance(prefix, str) and prefix for prefix in prefixes):
+            raise ValueError(f"Policy rule '{name}' has an invalid action_prefix")
+
+        if not prefixes and isinstance(rule.get('action_pattern'), str):
+            # An anchored pattern can be indexed by its literal start like a prefix
+            prefix = _literal_prefix(rule['action_pattern'])
+            if prefix:
+                prefixes = (prefix,)
+
+        patterns = {}
+        for key in ('action_pattern', 'details_pattern'):
+            if rule.get(key) is None:
+                continue
+            try:
+                patterns[key] = re.compile(rule[key])
+            except (re.error, TypeError) as e:
+                raise ValueError(f"Policy rule '{name}' has an invalid {key}: {e}")
+
+        if not prefixes and not patterns:
+            raise ValueError(f"Policy rule '{name}' needs an action_prefix, action_pattern or details_pattern")
+        return PolicyRule(index, name, decision, prefixes, **patterns)
@@ -0,0 +1,203 @@
+import asyncio
+import contextlib
+import cProfile
+import functools
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from config import (PROFILE_DIR, PROFILE_SLOW_MS, PROFILE_SAMPLE, PROFILE_LAG_MS, PROFILE_TRACEMALLOC,
+                    PROFILE_SNAPSHOT_INTERVAL, PROFILE_KEEP)
+from metrics import metrics
+
+# How often the event loop heartbeat runs, in seconds
+HEARTBEAT_INTERVAL = 0.05
+# Rotate the slow call log once it grows past this many bytes
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_NAME = 'slow_calls.log'
+
+
+class Profiler:
+    """Opt-in diagnostics for stalls and slow tool calls.
+
+    - Wrapped calls (tool calls, Telegram update handlers) taking longer than
+      slow_ms are logged to slow_calls.log in the profile directory.
+    - One call in every `sample_every` runs under cProfile (0 turns this off);
+      if that call turns out slow, its profile is saved as a .prof file for
+      pstats or snakeviz. Only one call is profiled at a time.
+    - A heartbeat task measures event loop lag. When the loop is blocked for
+      longer than lag_ms, a watchdog thread logs the loop thread's stack, which
+      shows exactly what is blocking it (a synchronous sqlite3 call, say).
+    - With tracemalloc on, a memory snapshot is saved every snapshot_interval
+      seconds and at shutdown.
+
+    Only the newest `keep` profile and snapshot files are kept.
+    """
+
+    def __init__(self, directory: str, slow_ms: float = 1000, sample_every: int = 10, lag_ms: float = 100,
+                 trace_memory: bool = False, snapshot_interval: float = 600, keep: int = 50):
+        self.directory = directory
+        self.slow_ms = slow_ms
+        self.sample_every = sample_every
+        self.lag_ms = lag_ms
+        self.trace_memory = trace_memory
+        self.snapshot_interval = snapshot_interval
+        self.keep = keep
+        self.loop_lag = 0.0
+        self.max_loop_lag = 0.0
+        self._calls = 0
+        self._active = None
+        self._log_lock = threading.Lock()
+        self._heartbeat = time.monotonic()
+        self._stall_reported = False
+        self._tasks = []
+        self._watchdog = None
+        self._stopped = threading.Event()
+        if metrics is not None:
+            metrics.gauge('telegram_mcp_event_loop_lag_seconds', 'Event loop lag at the last heartbeat',
+                          lambda: round(self.loop_lag, 6))
+            metrics.gauge('telegram_mcp_event_loop_lag_max_seconds', 'Largest event loop lag seen',
+                          lambda: round(self.max_loop_lag, 6))
+
+    def start(self):
+        """Start the heartbeat, watchdog and memory snapshots; call from the running loop."""
+        if self._tasks:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stopped.clear()
+        self._heartbeat = time.monotonic()
+        self._tasks.append(asyncio.create_task(self._beat()))
+        self._watchdog = threading.Thread(target=self._watch, args=(threading.get_ident(),),
+                                          name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        if self.trace_memory:
+            tracemalloc.start(10)
+            self._tasks.append(asyncio.create_task(self._snapshot_periodically()))
+
+    async def stop(self):
+        """Stop monitoring, saving a final memory snapshot if tracemalloc is on."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._stopped.set()
+        if self.trace_memory and tracemalloc.is_tracing():
+            await asyncio.to_thread(self._save_snapshot)
+            tracemalloc.stop()
+
+    def wrap(self, fn, describe):
+        """Return a wrapper running the coroutine function fn under profile().
+
+        describe receives fn's arguments and returns the name to report the
+        call under, or None to run the call unprofiled.
+        """
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            name = describe(*args, **kwargs)
+            if name is None:
+                return await fn(*args, **kwargs)
+            async with self.profile(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+
+    @contextlib.asynccontextmanager
+    async def profile(self, name: str):
+        """Time the enclosed block, profiling it if it is sampled."""
+        self._calls += 1
+        profile = None
+        if self.sample_every and self._active is None and self._calls % self.sample_every == 0:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                self._active = profile
+            except ValueError:
+                # Another profiler (a debugger, say) already owns the hook
+                profile = None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if profile is not None:
+                profile.disable()
+                self._active = None
+            if elapsed_ms >= self.slow_ms:
+                await self._report_slow(name, elapsed_ms, profile)
+
+    async def _report_slow(self, name: str, elapsed_ms: float, profile):
+        line = f"slow call: {name} took {elapsed_ms:.0f} ms"
+        if profile is not None:
+            path = self._new_path(f"{name}-{elapsed_ms:.0f}ms", 'prof')
+            # Writing the stats file is blocking disk I/O; keep it off the loop
+            await asyncio.to_thread(self._dump_profile, profile, path)
+            line += f" (profile: {os.path.basename(path)})"
+        self._log(line)
+
+    def _dump_profile(self, profile, path: str):
+        profile.dump_stats(path)
+        self._rotate()
+
+    async def _beat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            self.loop_lag = max(0.0, now - before - HEARTBEAT_INTERVAL)
+            self.max_loop_lag = max(self.max_loop_lag, self.loop_lag)
+            self._heartbeat = now
+            if self.loop_lag * 1000 >= self.lag_ms:
+                self._log(f"event loop lag: {self.loop_lag * 1000:.0f} ms")
+            self._stall_reported = False
+
+    def _watch(self, loop_thread_id: int):
+        """Watchdog thread: log the loop thread's stack while the loop is blocked."""
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            blocked_ms = (time.monotonic() - self._heartbeat - HEARTBEAT_INTERVAL) * 1000
+            if blocked_ms < self.lag_ms or self._stall_reported:
+                continue
+            self._stall_reported = True
+            frame = sys._current_frames().get(loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else '(no frame)\n'
+            self._log(f"event loop blocked for {blocked_ms:.0f} ms so far; loop thread stack:\n{stack.rstrip()}")
+
+    async def _snapshot_periodically(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await asyncio.to_thread(self._save_snapshot)
+
+    def _save_snapshot(self):
+        tracemalloc.take_snapshot().dump(self._new_path('memory', 'snapshot'))
+        self._rotate()
+
+    def _new_path(self, name: str, extension: str) -> str:
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+        return os.path.join(self.directory, f"{stamp}-{os.getpid()}-{safe_name}.{extension}")
+
+    def _rotate(self):
+        files = [entry for entry in os.scandir(self.directory)
+                 if entry.is_file() and entry.name.endswith(('.prof', '.snapshot'))]
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:max(0, len(files) - self.keep)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _log(self, line: str):
+        path = os.path.join(self.directory, LOG_NAME)
+        with self._log_lock:
+            try:
+                if os.path.exists(path) and os.path.getsize(path) > LOG_MAX_BYTES:
+                    os.replace(path, path + '.1')
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} [{os.getpid()}] {line}\n")
+            except OSError as e:
+                print(f"Profile log error: {e}", file=sys.stderr)
+
+
+# None unless TELEGRAM_PROFILE_DIR is set; nothing is wrapped then
+profiler = Profiler(PROFILE_DIR, PROFILE_SLOW_MS, PROFILE_SAMPLE, PROFILE_LAG_MS, PROFILE_TRACEMALLOC,
+                    PROFILE_SNAPSHOT_INTERVAL, PROFILE_KEEP) if PROFILE_DIR else None
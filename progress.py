@@ -0,0 +1,121 @@
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+
+
+class _TaskMessage:
+    __slots__ = ('message_id', 'latest', 'sent', 'last_edit', 'last_update', 'final', 'flush')
+
+    def __init__(self, text: str, final: bool):
+        self.message_id = None
+        self.latest = text
+        self.sent = None
+        self.last_edit = 0.0
+        self.last_update = time.monotonic()
+        self.final = final
+        self.flush = None
+
+
+class ProgressUpdater:
+    """Keeps one Telegram message per task and edits it in place.
+
+    The first update for a task sends a message; later updates only record
+    the newest text. At most one edit per task goes out every `interval`
+    seconds, carrying whatever the latest state is at that point. Once a
+    final state has been delivered the task is forgotten.
+
+    Tasks that never reach a final state are forgotten once they have had no
+    update for `ttl` seconds, and the least recently updated go first when
+    more than `max_tasks` are tracked. A later update for a forgotten task
+    starts a new message.
+
+    send is an async callable taking (task_id, text) and returning the sent
+    message; edit takes (task_id, message_id, text).
+    """
+
+    def __init__(self, send, edit, interval: float = 3.0, max_tasks: int = 1000, ttl: float = 3600):
+        self._send = send
+        self._edit = edit
+        self.interval = interval
+        self.max_tasks = max_tasks
+        self.ttl = ttl
+        self._tasks = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def update(self, task_id, text: str, final: bool = False) -> bool:
+        """Record the latest text for a task. Returns True if a new message was sent."""
+        state = self._tasks.get(task_id)
+        if state is not None:
+            self._tasks.move_to_end(task_id)
+            state.latest = text
+            state.final = final
+            state.last_update = time.monotonic()
+            # If the first send is still in flight it schedules the edit itself
+            if state.message_id is not None:
+                self._schedule(task_id, state)
+            return False
+
+        state = self._tasks[task_id] = _TaskMessage(text, final)
+        self._evict()
+        try:
+            message = await self._send(task_id, text)
+        except Exception:
+            self._forget(task_id, state)
+            raise
+        state.message_id = message.message_id
+        state.sent = text
+        state.last_edit = time.monotonic()
+        if state.latest != state.sent:
+            self._schedule(task_id, state)
+        elif state.final:
+            self._forget(task_id, state)
+        return True
+
+    async def close(self):
+        """Cancel pending edits and forget every task."""
+        flushes = [state.flush for state in self._tasks.values() if state.flush is not None]
+        self._tasks.clear()
+        for flush in flushes:
+            flush.cancel()
+        await asyncio.gather(*flushes, return_exceptions=True)
+
+    def _forget(self, task_id, state: _TaskMessage):
+        # The task may have been evicted, and even started again, meanwhile
+        if self._tasks.get(task_id) is state:
+            del self._tasks[task_id]
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._tasks:
+            task_id, state = next(iter(self._tasks.items()))
+            if len(self._tasks) <= self.max_tasks and state.last_update > cutoff:
+                break
+            del self._tasks[task_id]
+
+    def _schedule(self, task_id, state: _TaskMessage):
+        if state.flush is not None:
+            return
+        delay = max(0.0, state.last_edit + self.interval - time.monotonic())
+        state.flush = asyncio.create_task(self._flush(task_id, state, delay))
+
+    async def _flush(self, task_id, state: _TaskMessage, delay: float):
+        """Send the latest state of a task once its edit interval has passed."""
+        await asyncio.sleep(delay)
+        text = state.latest
+        if text != state.sent:
+            try:
+                await self._edit(task_id, state.message_id, text)
+            except Exception as e:
+                if 'not modified' not in str(e).lower():
+                    print(f"Progress update error: {e}", file=sys.stderr)
+            state.sent = text
+            state.last_edit = time.monotonic()
+        state.flush = None
+
+        if state.latest != state.sent:
+            self._schedule(task_id, state)
+        elif state.final:
+            self._forget(task_id, state)
@@ -0,0 +1,88 @@
+import json
+
+KINDS = ('approval', 'notification', 'progress')
+
+
+class Route:
+    """Send matching messages to `chats`; unset conditions match anything."""
+    __slots__ = ('chats', 'kinds', 'priorities', 'prefixes')
+
+    def __init__(self, chats: tuple, kinds=None, priorities=None, prefixes=None):
+        self.chats = chats
+        self.kinds = kinds
+        self.priorities = priorities
+        self.prefixes = prefixes
+
+    def matches(self, kind: str, priority, texts) -> bool:
+        if self.kinds is not None and kind not in self.kinds:
+            return False
+        # Approvals have no priority, so a priority condition never matches them
+        if self.priorities is not None and priority not in self.priorities:
+            return False
+        if self.prefixes is not None and not any(text.startswith(self.prefixes) for text in texts):
+            return False
+        return True
+
+
+class ChatRouter:
+    """Decides which chats an approval, notification or progress update goes to.
+
+    Routes are checked in order and the first match wins; its message is
+    sent to every chat it lists. Messages no route matches go to the default
+    chats. Every chat named anywhere may answer approvals.
+    """
+
+    def __init__(self, default_chats, routes: list = ()):
+        self.default_chats = tuple(default_chats)
+        self.routes = [self._parse_route(index, route) for index, route in enumerate(routes)]
+        self.all_chats = frozenset(self.default_chats).union(*(route.chats for route in self.routes))
+
+    @classmethod
+    def load(cls, path: str, default_chat: int) -> 'ChatRouter':
+        """Load routes from a JSON file: {"default": [chat, ...], "routes": [{...}, ...]}."""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Could not load chat routes {path}: {e}")
+        if not isinstance(data, dict) or not isinstance(data.get('routes', []), list):
+            raise ValueError(f"Chat routes {path} must be an object with a 'routes' list")
+        default_chats = cls._chat_ids(data.get('default') or [default_chat], 'default')
+        return cls(default_chats, data.get('routes', []))
+
+    def chats_for(self, kind: str, priority: str = None, texts=()) -> tuple:
+        """Chats a message of this kind, priority and text (or action) goes to."""
+        for route in self.routes:
+            if route.matches(kind, priority, texts):
+                return route.chats
+        return self.default_chats
+
+    @classmethod
+    def _parse_route(cls, index: int, route: dict) -> Route:
+        if not isinstance(route, dict):
+            raise ValueError(f"Chat route {index + 1} must be an object")
+        chats = cls._chat_ids(route.get('chats'), f"route {index + 1}")
+        kinds = cls._options(route.get('kind'))
+        if kinds is not None and not kinds <= set(KINDS):
+            raise ValueError(f"Chat route {index + 1} has an unknown kind; use {', '.join(KINDS)}")
+        prefixes = route.get('action_prefix')
+        if isinstance(prefixes, str):
+            prefixes = [prefixes]
+        return Route(chats, kinds, cls._options(route.get('priority')),
+                     tuple(prefixes) if prefixes else None)
+
+    @staticmethod
+    def _options(value):
+        if value is None:
+            return None
+        return frozenset([value] if isinstance(value, str) else value)
+
+    @staticmethod
+    def _chat_ids(value, where: str) -> tuple:
+        if not value:
+            raise ValueError(f"Chat {where} needs at least one chat ID")
+        try:
+            # dict.fromkeys drops duplicates but keeps the configured order
+            return tuple(dict.fromkeys(int(chat_id) for chat_id in value))
+        except (TypeError, ValueError):
+            raise ValueError(f"Chat {where} has an invalid chat ID")
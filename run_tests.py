@@ -35,7 +35,9 @@ def main():
     
     tests = [
         ("test_all_features.py", "Basic feature test with 30s interaction (~40 seconds)"),
-        ("test_telegram_service.py", "Comprehensive test with 3 scenarios (~5 minutes)")
+        ("test_telegram_service.py", "Comprehensive test with 3 scenarios (~5 minutes)"),
+        ("benchmark.py", "Offline throughput/latency/memory benchmark against a fake Bot API (no bot needed)"),
+        ("test_offline.py", "Offline behaviour tests against a fake Bot API (no bot needed, ~5 seconds)")
     ]
     
     print(f"\nFound {len(tests)} test files:")
@@ -46,10 +48,12 @@ def main():
     print("  1. Run basic feature test only (quick)")
     print("  2. Run interactive test only (comprehensive)")  
     print("  3. Run all tests")
-    print("  4. Exit")
+    print("  4. Run offline benchmark (no Telegram needed)")
+    print("  5. Run offline tests (no Telegram needed)")
+    print("  6. Exit")
     
     try:
-        choice = input("\nSelect option (1-4): ").strip()
+        choice = input("\nSelect option (1-6): ").strip()
         
         if choice == "1":
             run_test(tests[0][0], tests[0][1])
@@ -57,16 +61,20 @@ def main():
             run_test(tests[1][0], tests[1][1])
         elif choice == "3":
             print("\n[INFO] Running all tests...")
-            for test_name, description in tests:
+            for test_name, description in tests[:2]:
                 success = run_test(test_name, description)
                 if not success:
                     print(f"\n[WARN] Test {test_name} failed, but continuing with remaining tests...")
             print("\n[DONE] All tests completed!")
         elif choice == "4":
+            run_test(tests[2][0], tests[2][1])
+        elif choice == "5":
+            run_test(tests[3][0], tests[3][1])
+        elif choice == "6":
             print("Goodbye!")
             return
         else:
-            print("Invalid choice. Please select 1-4.")
+            print("Invalid choice. Please select 1-6.")
             return
             
     except KeyboardInterrupt:
@@ -1,126 +1,327 @@
-from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, MessageHandler, CallbackQueryHandler, filters
-from config import TOKEN, CHAT_ID, STATUS_EMOJIS, PRIORITY_EMOJIS
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile, InputMediaDocument
+from telegram.error import BadRequest
+from config import (TOKEN, CHAT_ID, API_BASE_URL, DB_PATH, STATUS_EMOJIS, PRIORITY_EMOJIS, APPROVAL_CACHE_SIZE, APPROVAL_CACHE_TTL,
+                    RATE_LIMIT_GLOBAL, RATE_LIMIT_PER_CHAT, RATE_LIMIT_CHAT_BURST, PROGRESS_EDIT_INTERVAL,
+                    PROGRESS_TASK_TTL, PROGRESS_MAX_TASKS, HTTP_POOL_SIZE,
+                    DIGEST_INTERVAL, DIGEST_MAX_ITEMS, DIGEST_PRIORITIES, PROFILE_DIR, ROUTES_FILE,
+                    MAX_UPLOAD_MB, TEXT_MAX_PAGES, LOG_TAIL_MAX_BYTES, PARSE_MODE,
+                    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, ALLOWED_UPDATES,
+                    MAX_BATCH_SIZE)
+from approval_cache import ApprovalCache, ApprovalRecord, OPEN_STATUSES
+from approval_store import ApprovalStore
+from approval_ids import new_request_id, encode_callback_data, decode_callback_data
+from outbound import OutboundDispatcher
+from progress import ProgressUpdater
+from outbox import Outbox
+from digest import NotificationDigest, MESSAGE_LIMIT
+from attachments import CAPTION_LIMIT, check_files, media_groups, read_tail, split_text, gzip_text
+from templates import (ellipsize, to_plain, PRIORITY, STATUS, APPROVAL, APPROVAL_DETAILS, APPROVAL_PAGE, APPROVED, DENIED,
+                       DENIED_CUSTOM, SUGGEST, INSTRUCTION_RECEIVED, BATCH_REQUIRED, BATCH_COMPLETE, BATCH_DETAILS,
+                       BATCH_ITEM)
+from routing import ChatRouter
+from http_client import create_bot_requests
+from metrics import metrics
 import asyncio
-import time
-import sqlite3
+import contextlib
 import os
+import sys
+import time
+
+# Approval details are shown this many characters at a time, paged with More/Back buttons
+DETAILS_PAGE_SIZE = 1000
+# Actions longer than this are cut short in messages (the request keeps the
+# full text). A batch item gets less room, so 20 of them plus the details
+# preview still fit in one message.
+ACTION_PREVIEW_SIZE = 1000
+BATCH_ACTION_PREVIEW_SIZE = 120
+# The custom instruction echoed back to the user, next to the action
+INSTRUCTION_PREVIEW_SIZE = 2000
+
+BATCH_STATUS_EMOJIS = {
+    'pending': '⏳',
+    'approved': '✅',
+    'denied': '❌'
+}
 
 class TelegramService:
     def __init__(self):
-        self.bot = Bot(token=TOKEN)
+        self._bot = None
         self.chat_id = CHAT_ID
-        self.approval_responses = {}
+        self.router = ChatRouter.load(ROUTES_FILE, CHAT_ID) if ROUTES_FILE else ChatRouter([CHAT_ID])
+        self.approval_responses = ApprovalCache(APPROVAL_CACHE_SIZE, APPROVAL_CACHE_TTL)
+        self._approval_waiters = {}
+        self._batches = {}
+        # One pooled connection stays free for calls made outside the queue (answering button presses)
+        self.outbound = OutboundDispatcher(RATE_LIMIT_GLOBAL, RATE_LIMIT_PER_CHAT, RATE_LIMIT_CHAT_BURST,
+                                           max_in_flight=max(1, HTTP_POOL_SIZE - 1))
+        self.progress = ProgressUpdater(self._send_progress_message, self._edit_progress_message,
+                                        PROGRESS_EDIT_INTERVAL, PROGRESS_MAX_TASKS, PROGRESS_TASK_TTL)
+        self.digest = (NotificationDigest(self._send_digest, DIGEST_INTERVAL, DIGEST_MAX_ITEMS)
+                       if DIGEST_INTERVAL > 0 else None)
         self.app = None
         self._listening_started = False
-        self.db_path = os.path.join(os.path.dirname(__file__), 'approval_responses.db')
-        self._init_database()
-    
-    def _init_database(self):
-        """Initialize SQLite database for approval responses."""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS approval_responses (
-                    request_id TEXT PRIMARY KEY,
-                    action TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    instruction TEXT,
-                    timestamp REAL NOT NULL
-                )
-            ''')
-            # Create index for faster lookups
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_status 
-                ON approval_responses(status)
-            ''')
-            conn.commit()
-            conn.close()
-        except sqlite3.Error as e:
-            print(f"Database initialization error: {e}")
+        self.db_path = DB_PATH
+        self._store = None
+        self._outbox = None
+        if metrics is not None:
+            metrics.gauge('telegram_mcp_outbound_queue_depth', 'Bot API calls waiting in the outbound queue',
+                          lambda: len(self.outbound))
+            metrics.gauge('telegram_mcp_outbox_depth', 'Messages waiting in the outbox',
+                          lambda: len(self._outbox) if self._outbox is not None else 0)
+            metrics.gauge('telegram_mcp_digest_depth', 'Notifications waiting for the next digest',
+                          lambda: len(self.digest) if self.digest is not None else 0)
+            metrics.gauge('telegram_mcp_pending_approvals', 'Approval requests waiting for a decision',
+                          lambda: len(self.approval_responses.open_items()))
+
+    @property
+    def bot(self) -> Bot:
+        """Bot API client, created on first use.
+
+        The same bot (and its connection pools) is handed to the Application,
+        so sends and polling share one HTTP client.
+        """
+        if self._bot is None:
+            request, get_updates_request = create_bot_requests()
+            self._bot = Bot(token=TOKEN, base_url=API_BASE_URL, request=request,
+                            get_updates_request=get_updates_request)
+        return self._bot
+
+    @bot.setter
+    def bot(self, bot: Bot):
+        self._bot = bot
+
+    @property
+    def store(self) -> ApprovalStore:
+        """Approval database, opened on first use."""
+        if self._store is None:
+            self._store = ApprovalStore(self.db_path)
+        return self._store
+
+    @property
+    def outbox(self) -> Outbox:
+        """Durable queue for notifications, backed by the store."""
+        if self._outbox is None:
+            self._outbox = Outbox(self.store, self._send_message)
+        return self._outbox
     
-    def _clean_database(self):
+    async def _clean_database(self):
         """Clean database - only use when explicitly needed."""
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
-        self._init_database()
+        await self.store.reset()
     
     def _save_approval_response(self, request_id: str, data: dict):
-        """Save approval response to database - only for custom instructions."""
-        # Only save if it's a custom instruction denial that needs to persist
-        if data.get('status') in ['awaiting_custom_instruction', 'denied_custom']:
-            try:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO approval_responses 
-                    (request_id, action, status, instruction, timestamp)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    request_id,
-                    data.get('action', ''),
-                    data.get('status', ''),
-                    data.get('instruction', ''),
-                    data.get('timestamp', time.time())
-                ))
-                conn.commit()
-                conn.close()
-            except sqlite3.Error as e:
-                print(f"Database save error: {e}")
+        """Persist a request's current state so it survives a restart."""
+        # Buffered and written in batches by the store's writer thread
+        self.store.save(request_id, data)
     
-    def _load_approval_response(self, request_id: str) -> dict:
+    async def _load_approval_response(self, request_id: str) -> dict:
         """Load approval response from database."""
+        return await self.store.load(request_id)
+
+    async def close(self):
+        """Stop receiving updates, flush pending database writes and release the store."""
+        if self.app is not None:
+            try:
+                if self.app.updater and self.app.updater.running:
+                    await self.app.updater.stop()
+                if self.app.running:
+                    await self.app.stop()
+            except Exception as e:
+                print(f"Bot shutdown error: {e}", file=sys.stderr)
+        # Stop the send queues before the shared bot's connections are closed;
+        # undelivered outbox entries are sent on the next start
+        await self.progress.close()
+        if self.digest is not None:
+            await self.digest.close()
+        if self._outbox is not None:
+            await self._outbox.close()
+            self._outbox = None
+        await self.outbound.close()
+        if self.app is not None:
+            try:
+                await self.app.shutdown()
+            except Exception as e:
+                print(f"Bot shutdown error: {e}", file=sys.stderr)
+            self.app = None
+            # Shutting the application down closed the bot's connection pools too
+            self._bot = None
+            self._listening_started = False
+        if self._store is not None:
+            await self._store.flush()
+            self._store.close()
+            self._store = None
+
+    async def _send_message(self, priority: str = "normal", **kwargs):
+        """Send a message through the rate-limited outbound queue."""
+        return await self.outbound.submit(
+            kwargs['chat_id'], priority, lambda: self._formatted(self.bot.send_message, kwargs)
+        )
+
+    @staticmethod
+    async def _formatted(call, kwargs: dict):
+        """Make a send or edit call, as plain text if the markup is not ours.
+
+        Text in another parse mode than PARSE_MODE was not built by our
+        templates (outbox entries queued by an older version, or under a
+        different TELEGRAM_PARSE_MODE), so its markup is stripped before the
+        call instead of risking a rejection. Template output is fully escaped;
+        should Telegram still answer "can't parse entities", the call is
+        repeated once as plain text. That costs the caller a second round
+        trip, but the message is not lost.
+        """
+        parse_mode = kwargs.get('parse_mode')
+        if parse_mode and parse_mode != PARSE_MODE:
+            kwargs = dict(kwargs, text=to_plain(kwargs['text'], parse_mode), parse_mode=None)
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM approval_responses WHERE request_id = ?', (request_id,))
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row:
-                return {
-                    'action': row[1],
-                    'status': row[2],
-                    'instruction': row[3],
-                    'timestamp': row[4]
-                }
-            return {'status': 'not_found'}
-        except sqlite3.Error as e:
-            print(f"Database load error: {e}")
-            return {'status': 'not_found'}
-
-    def _escape_markdown(self, text: str) -> str:
-        """Escape markdown characters to prevent parsing errors."""
-        return text.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
-
-    async def send_progress(self, message: str, status: str) -> str:
-        """Send progress notification with status emoji."""
-        emoji = STATUS_EMOJIS.get(status, "📝")
-        # Escape markdown characters in user message and status to prevent parsing errors
-        escaped_message = self._escape_markdown(message)
-        escaped_status = self._escape_markdown(status.upper())
-        formatted_message = f"{emoji} **{escaped_status}**\n{escaped_message}"
+            return await call(**kwargs)
+        except BadRequest as e:
+            if not kwargs.get('parse_mode') or "can't parse entities" not in str(e).lower():
+                raise
+            print(f"Sending as plain text: {e}", file=sys.stderr)
+            return await call(**dict(kwargs, text=to_plain(kwargs['text'], kwargs['parse_mode']), parse_mode=None))
+
+    async def send_progress(self, message: str, status: str, task_id: str = None) -> str:
+        """Send progress notification with status emoji.
+
+        With a task_id, all updates for the task share one message that is
+        edited in place (throttled to one edit per PROGRESS_EDIT_INTERVAL).
+        """
+        formatted_message = STATUS.render(emoji=STATUS_EMOJIS.get(status, "📝"), status=status.upper(), message=message)
         
-        await self.bot.send_message(
-            chat_id=self.chat_id,
-            text=formatted_message,
-            parse_mode="Markdown"
-        )
+        chats = self.router.chats_for('progress', 'normal', (message,))
+        if task_id:
+            final = status in ['completed', 'error']
+            # Each routed chat gets its own message for the task, edited in place
+            sent = await asyncio.gather(*(self.progress.update((chat_id, task_id), formatted_message, final)
+                                          for chat_id in chats))
+            if any(sent):
+                return f"Progress notification sent: {status} - {message}"
+            return f"Progress updated for task {task_id}: {status} - {message}"
+        
+        # Queued durably; delivered in order by the outbox sender
+        await asyncio.gather(*(self.outbox.put("normal", chat_id=chat_id, text=formatted_message, parse_mode=PARSE_MODE)
+                               for chat_id in chats))
         return f"Progress notification sent: {status} - {message}"
 
+    async def _send_progress_message(self, key: tuple, text: str):
+        return await self._send_message(
+            chat_id=key[0],
+            text=text,
+            parse_mode=PARSE_MODE
+        )
+
+    async def _edit_progress_message(self, key: tuple, message_id: int, text: str):
+        return await self.outbound.submit(
+            key[0], "normal",
+            lambda: self._formatted(self.bot.edit_message_text, dict(
+                text=text, chat_id=key[0], message_id=message_id, parse_mode=PARSE_MODE
+            ))
+        )
 
     async def send_notification(self, message: str, priority: str = "normal") -> str:
         """Send general notification with priority emoji."""
-        emoji = PRIORITY_EMOJIS.get(priority, "📝")
-        formatted_message = f"{emoji} {message}"
+        formatted_message = PRIORITY.render(emoji=PRIORITY_EMOJIS.get(priority, "📝"), message=message)
+        chats = self.router.chats_for('notification', priority, (message,))
+
+        if len(formatted_message) > MESSAGE_LIMIT:
+            # Too long for one message (and for the digest)
+            sent_as = await self._send_text(chats, priority, formatted_message, "notification.txt.gz",
+                                            formatted_message.split('\n', 1)[0][:200])
+            return f"Notification sent as {sent_as} ({len(message)} characters)"
         
-        await self.bot.send_message(
-            chat_id=self.chat_id,
-            text=formatted_message
-        )
+        if self.digest is not None and priority in DIGEST_PRIORITIES:
+            # Routine messages are combined; high and urgent ones go out on their own
+            for chat_id in chats:
+                self.digest.add(chat_id, formatted_message)
+            return f"Notification queued for digest: {message}"
+
+        # Queued durably; each chat's outbox lane delivers in order, chats in parallel
+        await asyncio.gather(*(self.outbox.put(priority, chat_id=chat_id, text=formatted_message)
+                               for chat_id in chats))
         return f"Notification sent: {message}"
 
+    async def _send_formatted_notification(self, text: str, priority: str):
+        """Queue a notification rendered from a template, keeping its formatting."""
+        chats = self.router.chats_for('notification', priority, (text,))
+        await asyncio.gather(*(self.outbox.put(priority, chat_id=chat_id, text=text, parse_mode=PARSE_MODE)
+                               for chat_id in chats))
+
+    async def _send_digest(self, chat_id, text: str):
+        await self.outbox.put("normal", chat_id=chat_id, text=text)
+
+    async def send_files(self, paths: list, caption: str = "") -> str:
+        """Send files as documents, up to ten per message as a media group.
+
+        The HTTP client streams each file from disk instead of reading it into
+        memory, so multi-megabyte artifacts keep memory use flat. Uploads go
+        through the rate-limited queue but not the outbox, since the files
+        may be gone by the next start.
+        """
+        files = await asyncio.to_thread(check_files, paths, MAX_UPLOAD_MB * 1024 * 1024)
+        caption = caption[:CAPTION_LIMIT]
+        groups = media_groups(files)
+
+        async def send_to(chat_id):
+            for group in groups:
+                await self.outbound.submit(chat_id, "normal", lambda group=group: self._upload(chat_id, group, caption))
+
+        await self._each_chat(self.router.chats_for('notification', 'normal', (caption,) if caption else ()), send_to)
+        total = sum(size for _, size in files)
+        return (f"Sent {len(files)} file{'s' if len(files) != 1 else ''} ({total / 1024:.0f} KB) "
+                f"in {len(groups)} message{'s' if len(groups) != 1 else ''}")
+
+    async def _upload(self, chat_id, files: list, caption: str):
+        """Send one group of files, opened afresh so a retried upload starts from the beginning."""
+        with contextlib.ExitStack() as stack:
+            documents = [
+                InputFile(stack.enter_context(open(path, 'rb')), filename=os.path.basename(path),
+                          attach=len(files) > 1, read_file_handle=False)
+                for path, _ in files
+            ]
+            if len(documents) == 1:
+                return await self.bot.send_document(chat_id, documents[0], caption=caption or None)
+            # The caption goes under the last document, below the whole group
+            media = [InputMediaDocument(document, caption=(caption or None) if index == len(documents) else None)
+                     for index, document in enumerate(documents, 1)]
+            return await self.bot.send_media_group(chat_id, media)
+
+    async def send_log_tail(self, path: str, lines: int = 100, caption: str = "") -> str:
+        """Send the last lines of a text file, split over several messages or,
+        when long, as a compressed attachment."""
+        try:
+            text = await asyncio.to_thread(read_tail, path, lines, LOG_TAIL_MAX_BYTES)
+        except OSError as e:
+            raise ValueError(f"Cannot read {path}: {e.strerror}")
+        name = os.path.basename(path)
+        count = text.count('\n') + 1 if text else 0
+        header = f"📄 {name}: last {count} line{'s' if count != 1 else ''}"
+        if caption:
+            header = f"{header}\n{caption}"
+        chats = self.router.chats_for('notification', 'normal', (caption,) if caption else ())
+        sent_as = await self._send_text(chats, "normal", f"{header}\n\n{text or '(empty)'}", f"{name}.tail.gz",
+                                        header[:CAPTION_LIMIT])
+        return f"Sent the last {count} lines of {path} as {sent_as}"
+
+    async def _send_text(self, chats: tuple, priority: str, text: str, filename: str, caption: str) -> str:
+        """Queue plain text for every chat, split over several messages if it
+        is too long for one. Text needing more than TEXT_MAX_PAGES messages is
+        sent as a gzip attachment named filename instead. Returns how it was sent."""
+        pages = split_text(text)
+        if len(pages) <= TEXT_MAX_PAGES:
+            async def put(chat_id):
+                # A chat's pages share its outbox lane, so they arrive in order
+                for page in pages:
+                    await self.outbox.put(priority, chat_id=chat_id, text=page)
+
+            await asyncio.gather(*(put(chat_id) for chat_id in chats))
+            return f"{len(pages)} message{'s' if len(pages) != 1 else ''}"
+
+        data = gzip_text(text)
+        await self._each_chat(chats, lambda chat_id: self.outbound.submit(
+            chat_id, priority,
+            lambda: self.bot.send_document(chat_id, InputFile(data, filename=filename), caption=caption)
+        ))
+        return f"a compressed attachment {filename} ({len(data) / 1024:.0f} KB)"
+
     
     
     
@@ -130,134 +331,511 @@ class TelegramService:
         if not self._listening_started:
             await self._ensure_listening()
         
-        # Create unique request ID
-        request_id = f"approval_{int(time.time() * 1000)}"
+        # Random rather than time-based, so concurrent requests never share an ID
+        request_id = new_request_id()
         
-        # Store request in memory only - no need to save pending requests to database
-        approval_data = {
-            'action': action,
-            'details': details,
-            'status': 'pending',
-            'response': None,
-            'timestamp': time.time()
-        }
-        self.approval_responses[request_id] = approval_data
+        record = ApprovalRecord(action, details)
+        self.approval_responses.put(request_id, record)
+        self._save_approval_response(request_id, record.to_dict())
         
         # Send the approval request with inline buttons
-        await self._send_approval_with_buttons(action, details, request_id)
+        try:
+            record.messages = await self._send_approval_with_buttons(request_id, record)
+        except Exception:
+            await self._discard_requests([request_id])
+            raise
+        self._save_approval_response(request_id, record.to_dict())
+        if not record.is_open:
+            # Answered from one chat before the other copies were sent
+            await self._show_decision(record)
         
         return request_id
     
-    def get_approval_status(self, request_id: str) -> dict:
+    async def create_approval_batch(self, actions: list, details: str = "") -> dict:
+        """Send several actions for approval in one message and return their IDs.
+
+        Every action becomes its own approval request, so waiting and status
+        checks work per item exactly as for single requests.
+        """
+        if not actions:
+            raise ValueError("At least one action is required")
+        if len(actions) > MAX_BATCH_SIZE:
+            raise ValueError(f"A batch can hold at most {MAX_BATCH_SIZE} actions")
+        if not self._listening_started:
+            await self._ensure_listening()
+
+        batch_id = new_request_id('batch')
+        request_ids = [f"{batch_id}_{index}" for index in range(1, len(actions) + 1)]
+        for request_id, action in zip(request_ids, actions):
+            # Each item carries the batch details so the batch can be restored after a restart
+            record = ApprovalRecord(action, details, batch_id=batch_id)
+            self.approval_responses.put(request_id, record)
+            self._save_approval_response(request_id, record.to_dict())
+        batch = self._batches[batch_id] = {'request_ids': request_ids, 'actions': list(actions), 'details': details}
+
+        try:
+            text, reply_markup = self._render_batch(batch_id)
+            messages = await self._fan_out(
+                self.router.chats_for('approval', None, actions),
+                "urgent",
+                text=text,
+                parse_mode=PARSE_MODE,
+                reply_markup=reply_markup
+            )
+        except Exception:
+            self._batches.pop(batch_id, None)
+            await self._discard_requests(request_ids)
+            raise
+        batch['messages'] = messages
+        decided = False
+        for request_id in request_ids:
+            record = self.approval_responses.get(request_id)
+            if record is not None:
+                record.messages = messages
+                self._save_approval_response(request_id, record.to_dict())
+                decided = decided or not record.is_open
+        if decided:
+            # Items were answered from one chat before the other copies were sent
+            self._batches[batch_id] = batch
+            await self._refresh_batch_message(None, batch_id)
+        return {'batch_id': batch_id, 'request_ids': request_ids}
+
+    async def _discard_requests(self, request_ids: list):
+        """Forget requests whose message could not be sent anywhere.
+
+        No buttons were shown and the agent never got the IDs, so nobody
+        could ever answer them; left open they would never be evicted.
+        """
+        for request_id in request_ids:
+            self.approval_responses.discard(request_id)
+        await self.store.delete(request_ids)
+
+    def _render_batch(self, batch_id: str):
+        """Build the text and keyboard of a batch message from its items' current state."""
+        batch = self._batches[batch_id]
+        lines = []
+        keyboard = []
+        open_count = 0
+        for index, (request_id, action) in enumerate(zip(batch['request_ids'], batch['actions']), 1):
+            record = self.approval_responses.get(request_id)
+            # A decided item may already have been evicted from the cache
+            status = record.status if record is not None else 'unknown'
+            lines.append(BATCH_ITEM.render(emoji=BATCH_STATUS_EMOJIS.get(status, '❔'), index=index,
+                                         action=ellipsize(action, BATCH_ACTION_PREVIEW_SIZE)))
+            if status == 'pending':
+                open_count += 1
+                keyboard.append([
+                    InlineKeyboardButton(f"✅ Approve {index}", callback_data=encode_callback_data("approve", request_id)),
+                    InlineKeyboardButton(f"❌ Deny {index}", callback_data=encode_callback_data("deny", request_id))
+                ])
+
+        text = (BATCH_REQUIRED if open_count else BATCH_COMPLETE).render()
+        if batch['details']:
+            pages = split_text(batch['details'], DETAILS_PAGE_SIZE)
+            # Batch messages are redrawn for every decision, so long details are only previewed
+            more = f" … ({len(batch['details'])} characters)" if len(pages) > 1 else ""
+            text += BATCH_DETAILS.render(details=pages[0], more=more)
+        text += "\n".join(lines)
+
+        if open_count > 1:
+            keyboard.append([InlineKeyboardButton("✅ Approve all", callback_data=encode_callback_data("approveall", batch_id))])
+        return text, InlineKeyboardMarkup(keyboard) if keyboard else None
+
+    async def _refresh_batch_message(self, query, batch_id: str):
+        """Redraw every copy of a batch message after a decision; forget the batch
+        once every item is decided."""
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            return
+        text, reply_markup = self._render_batch(batch_id)
+        if reply_markup is None:
+            del self._batches[batch_id]
+        await self._edit_copies(batch.get('messages'), query, text, parse_mode=PARSE_MODE, reply_markup=reply_markup)
+
+    def _complete_request(self, request_id: str):
+        """Mark a request as decided and wake up any tool calls waiting on it."""
+        record = self.approval_responses.get(request_id)
+        self.approval_responses.resolve(request_id)
+        # Decided requests no longer show their details
+        record.pages = None
+        self._save_approval_response(request_id, record.to_dict())
+        if metrics is not None:
+            metrics.decision_time.observe(record.status, time.time() - record.timestamp)
+        waiter = self._approval_waiters.pop(request_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(record.to_dict())
+
+    async def wait_for_approval(self, request_id: str, timeout: float) -> dict:
+        """Wait until the user decides on a request or the timeout expires."""
+        status = await self.get_approval_status(request_id)
+        if status['status'] not in OPEN_STATUSES:
+            return status
+        # A request from before a restart has nobody listening for its answer yet
+        await self._ensure_listening()
+
+        # Waiters for the same request share one future, resolved by the update handlers
+        waiter = self._approval_waiters.get(request_id)
+        if waiter is None:
+            waiter = asyncio.get_running_loop().create_future()
+            self._approval_waiters[request_id] = waiter
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            return await self.get_approval_status(request_id)
+
+    async def get_approval_status(self, request_id: str) -> dict:
         """Get the current status of an approval request."""
         # First check in-memory storage
-        if request_id in self.approval_responses:
-            return self.approval_responses[request_id]
+        record = self.approval_responses.get(request_id)
+        if record is not None:
+            return record.to_dict()
         
         # Then check database
-        db_response = self._load_approval_response(request_id)
+        db_response = await self._load_approval_response(request_id)
         if db_response['status'] != 'not_found':
-            # Update in-memory cache with database data
-            self.approval_responses[request_id] = db_response
+            self._cache_stored_response(request_id, db_response)
             return db_response
             
         return {'status': 'not_found'}
+
+    def _cache_stored_response(self, request_id: str, db_response: dict) -> ApprovalRecord:
+        """Cache a response read from the database and return its record."""
+        record = ApprovalRecord(
+            action=db_response['action'],
+            details=db_response.get('details') or "",
+            status=db_response['status'],
+            instruction=db_response['instruction'],
+            timestamp=db_response['timestamp'],
+            batch_id=db_response.get('batch_id')
+        )
+        record.prompt_message_id = db_response.get('prompt_message_id')
+        record.prompt_chat_id = db_response.get('prompt_chat_id')
+        record.messages = db_response.get('messages')
+        # Decided requests are subject to the cache's size and TTL limits
+        self.approval_responses.put(request_id, record)
+        return record
+
+    async def _find_record(self, request_id: str):
+        """Cached record for request_id, falling back to the database (e.g. after a restart)."""
+        record = self.approval_responses.get(request_id)
+        if record is None and (await self.get_approval_status(request_id))['status'] != 'not_found':
+            record = self.approval_responses.get(request_id)
+        return record
+
+    async def _restore_open_requests(self):
+        """Reload requests still waiting for the user, so buttons on messages sent
+        before a restart keep working."""
+        open_requests = await self.store.load_open()
+        batch_ids = set()
+        for request_id, db_response in open_requests.items():
+            if request_id not in self.approval_responses:
+                self._cache_stored_response(request_id, db_response)
+            if db_response.get('batch_id'):
+                batch_ids.add(db_response['batch_id'])
+        for batch_id in batch_ids:
+            await self._restore_batch(batch_id)
+
+    async def resume(self):
+        """Resend messages a previous run left in the outbox.
+
+        Open approvals are not restored here: the database may be shared by
+        other agents' processes, and polling from each of them would fight
+        over getUpdates. They are reloaded once this process listens, which
+        happens when it creates an approval or waits on an open one.
+        """
+        await self.outbox.start()
+
+    async def _restore_batch(self, batch_id: str):
+        """Rebuild a batch message's layout from its stored items."""
+        if batch_id in self._batches:
+            return
+        items = await self.store.load_batch(batch_id)
+        if not items:
+            return
+        # Item IDs end in their 1-based position in the message
+        request_ids = sorted(items, key=lambda request_id: int(request_id.rsplit('_', 1)[1]))
+        for request_id in request_ids:
+            if request_id not in self.approval_responses:
+                self._cache_stored_response(request_id, items[request_id])
+        details = next((items[request_id]['details'] for request_id in request_ids
+                        if items[request_id]['details']), "")
+        messages = next((items[request_id]['messages'] for request_id in request_ids
+                         if items[request_id].get('messages')), None)
+        self._batches[batch_id] = {
+            'request_ids': request_ids,
+            'actions': [items[request_id]['action'] for request_id in request_ids],
+            'details': details,
+            'messages': messages
+        }
     
+    async def get_approval_statuses(self, request_ids: list) -> dict:
+        """Get the current status of several requests, keyed by request ID.
+
+        Cached requests are answered from memory; the rest are read from the
+        database in a single query.
+        """
+        statuses = {}
+        missing = []
+        for request_id in request_ids:
+            record = self.approval_responses.get(request_id)
+            if record is not None:
+                statuses[request_id] = record.to_dict()
+            else:
+                missing.append(request_id)
+
+        if missing:
+            for request_id, db_response in (await self.store.load_many(missing)).items():
+                if db_response['status'] != 'not_found':
+                    self._cache_stored_response(request_id, db_response)
+                statuses[request_id] = db_response
+        return {request_id: statuses[request_id] for request_id in request_ids}
+
+    async def get_server_stats(self):
+        """This process's metrics snapshot, or None when metrics are disabled."""
+        return metrics.snapshot() if metrics is not None else None
+
     async def _ensure_listening(self):
         """Ensure we're listening for messages."""
         if not self._listening_started:
-            self.app = Application.builder().token(TOKEN).build()
-            self.app.add_handler(MessageHandler(filters.TEXT & filters.ChatType.PRIVATE, self._handle_approval_response))
-            self.app.add_handler(CallbackQueryHandler(self._handle_button_callback))
+            self._listening_started = True
+            # Before any update arrives, so presses on pre-restart messages find their request
+            await self._restore_open_requests()
+            # telegram.ext is the heaviest import; only pay for it once updates are needed
+            from telegram.ext import Application, MessageHandler, CallbackQueryHandler, filters
+            # Handlers wait on the shared send queue, so one slow edit must not hold up other button presses
+            self.app = Application.builder().bot(self.bot).concurrent_updates(True).build()
+            handle_message, handle_callback = self._handle_approval_response, self._handle_button_callback
+            if PROFILE_DIR:
+                from profiling import profiler
+                handle_message = profiler.wrap(handle_message, lambda update, context: "update message")
+                handle_callback = profiler.wrap(handle_callback, lambda update, context: "update callback_query")
+            # Group chats may be routed approvals too; the handler checks the chat is known
+            self.app.add_handler(MessageHandler(filters.TEXT, handle_message))
+            self.app.add_handler(CallbackQueryHandler(handle_callback))
             
             # Start the application in background
             asyncio.create_task(self._run_bot())
-            self._listening_started = True
+            # Resend anything a previous run left in the outbox
+            await self.outbox.start()
     
     async def _run_bot(self):
-        """Run the bot polling in background."""
+        """Run the bot in background, via webhook if configured, else long polling."""
+        app = self.app
+        if app is None:
+            # Closed before the background task got to run
+            return
         try:
-            await self.app.initialize()
-            await self.app.start()
-            await self.app.updater.start_polling()
+            await app.initialize()
+            await app.start()
+            if WEBHOOK_URL:
+                # Telegram signs each webhook request with the secret token; PTB rejects others
+                await app.updater.start_webhook(
+                    listen=WEBHOOK_LISTEN,
+                    port=WEBHOOK_PORT,
+                    url_path=WEBHOOK_PATH,
+                    webhook_url=WEBHOOK_URL,
+                    secret_token=WEBHOOK_SECRET,
+                    allowed_updates=ALLOWED_UPDATES
+                )
+            else:
+                await app.updater.start_polling(allowed_updates=ALLOWED_UPDATES)
         except Exception as e:
-            print(f"Bot error: {e}")
+            print(f"Bot error: {e}", file=sys.stderr)
     
-    async def _send_approval_with_buttons(self, action: str, details: str, request_id: str):
-        """Send approval request with inline buttons."""
-        # Escape markdown characters in user input
-        escaped_action = self._escape_markdown(action)
-        escaped_details = self._escape_markdown(details) if details else ""
+    async def _send_approval_with_buttons(self, request_id: str, record: ApprovalRecord) -> list:
+        """Send approval request with inline buttons to every routed chat.
+
+        Returns (chat_id, message_id) of each copy sent.
+        """
+        message, reply_markup = self._render_approval(request_id, record)
         
-        message = f"🤔 **APPROVAL REQUIRED**\n\n**Action:** {escaped_action}\n"
-        if escaped_details:
-            message += f"**Details:** {escaped_details}\n"
+        # Approvals block an agent, so they jump ahead of routine messages
+        return await self._fan_out(
+            self.router.chats_for('approval', None, (record.action,)),
+            "urgent",
+            text=message,
+            parse_mode=PARSE_MODE,
+            reply_markup=reply_markup
+        )
+
+    def _detail_pages(self, record: ApprovalRecord) -> list:
+        """A request's details split into pages, built once and kept on the record."""
+        if record.pages is None:
+            record.pages = split_text(record.details, DETAILS_PAGE_SIZE) if record.details else []
+        return record.pages
+
+    def _render_approval(self, request_id: str, record: ApprovalRecord, page: int = 0):
+        """Text and keyboard of an open request, showing one page of its details."""
+        pages = self._detail_pages(record)
+        action = ellipsize(record.action, ACTION_PREVIEW_SIZE)
+        if len(pages) > 1:
+            page = min(max(page, 0), len(pages) - 1)
+            message = APPROVAL_PAGE.render(action=action, page=page + 1, pages=len(pages), details=pages[page])
+        elif pages:
+            message = APPROVAL_DETAILS.render(action=action, details=pages[0])
+        else:
+            message = APPROVAL.render(action=action)
         
         # Create simple inline keyboard with 3 clear options
         keyboard = [
             [
-                InlineKeyboardButton("✅ Approve", callback_data=f"approve_{request_id}")
+                InlineKeyboardButton("✅ Approve", callback_data=encode_callback_data("approve", request_id))
             ],
             [
-                InlineKeyboardButton("❌ Deny", callback_data=f"deny_{request_id}"),
-                InlineKeyboardButton("🔄 Suggest Different Approach", callback_data=f"suggest_{request_id}")
+                InlineKeyboardButton("❌ Deny", callback_data=encode_callback_data("deny", request_id)),
+                InlineKeyboardButton("🔄 Suggest Different Approach", callback_data=encode_callback_data("suggest", request_id))
             ]
         ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await self.bot.send_message(
-            chat_id=self.chat_id,
-            text=message,
-            parse_mode="Markdown",
-            reply_markup=reply_markup
+        if len(pages) > 1:
+            navigation = []
+            if page > 0:
+                navigation.append(InlineKeyboardButton(
+                    "◂ Back", callback_data=encode_callback_data("page", f"{request_id}:{page - 1}")))
+            if page < len(pages) - 1:
+                navigation.append(InlineKeyboardButton(
+                    "More ▸", callback_data=encode_callback_data("page", f"{request_id}:{page + 1}")))
+            keyboard.append(navigation)
+        return message, InlineKeyboardMarkup(keyboard)
+
+    async def _fan_out(self, chats: tuple, priority: str, **kwargs) -> list:
+        """Send the same message to several chats at once.
+
+        Each chat has its own rate budget in the outbound queue, so sending to
+        many chats takes about as long as sending to one. Returns
+        (chat_id, message_id) of each copy sent; fails only if every send did.
+        """
+        sent = await self._each_chat(chats, lambda chat_id: self._send_message(priority, chat_id=chat_id, **kwargs))
+        return [(chat_id, message.message_id) for chat_id, message in sent]
+
+    async def _each_chat(self, chats: tuple, send) -> list:
+        """Run send(chat_id) for every chat at once and return (chat_id, result)
+        for those that succeeded; raises only if every chat failed."""
+        results = await asyncio.gather(*(send(chat_id) for chat_id in chats), return_exceptions=True)
+        succeeded = []
+        errors = []
+        for chat_id, result in zip(chats, results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+            else:
+                succeeded.append((chat_id, result))
+        if not succeeded:
+            raise errors[0]
+        for error in errors:
+            print(f"Fan-out send error: {error}", file=sys.stderr)
+        return succeeded
+    
+    async def _edit_callback_message(self, query, text: str, **kwargs):
+        """Edit the message a button was pressed on, via the outbound queue."""
+        return await self.outbound.submit(
+            query.message.chat.id if query.message else self.chat_id,
+            "urgent",
+            lambda: self._formatted(query.edit_message_text, dict(kwargs, text=text))
         )
+
+    async def _edit_copies(self, messages, query, text: str, **kwargs):
+        """Edit every copy of a routed message at once.
+
+        Requests stored without their copies (sent before routing existed)
+        only have the message the button was pressed on, if any.
+        """
+        if not messages:
+            if query is not None:
+                await self._edit_callback_message(query, text, **kwargs)
+            return
+
+        def edit(chat_id, message_id):
+            return self.outbound.submit(chat_id, "urgent", lambda: self._formatted(
+                self.bot.edit_message_text, dict(kwargs, text=text, chat_id=chat_id, message_id=message_id)))
+
+        results = await asyncio.gather(*(edit(chat_id, message_id) for chat_id, message_id in messages),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception) and 'not modified' not in str(result).lower():
+                print(f"Message edit error: {result}", file=sys.stderr)
+
+    def _decision_text(self, record: ApprovalRecord) -> str:
+        """Final text shown on an approval message once it has been answered."""
+        decided_by = record.decided_by
+        action = ellipsize(record.action, ACTION_PREVIEW_SIZE)
+        if record.status == 'approved':
+            return APPROVED.render(action=action, decided_by=decided_by or 'user')
+        by = f" by {decided_by}" if decided_by else ""
+        if record.status == 'denied_custom':
+            return DENIED_CUSTOM.render(action=action, by=by)
+        return DENIED.render(action=action, by=by)
+
+    async def _show_decision(self, record: ApprovalRecord, query=None, decided_by: str = None):
+        """Replace the buttons on every copy of a decided request with the decision."""
+        if decided_by:
+            record.decided_by = decided_by
+        await self._edit_copies(record.messages, query, self._decision_text(record), parse_mode=PARSE_MODE)
+
+    async def _show_typed_decision(self, record: ApprovalRecord, decided_by: str = None):
+        """Show a decision typed as a message; batch items redraw their shared message."""
+        if record.batch_id is None:
+            await self._show_decision(record, decided_by=decided_by)
+            return
+        record.decided_by = decided_by
+        if record.batch_id not in self._batches:
+            await self._restore_batch(record.batch_id)
+        await self._refresh_batch_message(None, record.batch_id)
     
     async def _handle_approval_response(self, update: Update, context):
         """Handle approval responses."""
-        if update.effective_chat.id != self.chat_id:
+        chat = update.effective_chat
+        if chat.id not in self.router.all_chats:
             return
         
         message_text = update.message.text.strip()
+        decided_by = update.effective_user.first_name if update.effective_user else None
         
-        # First, check for custom instructions waiting for user input
-        for request_id, approval_data in self.approval_responses.items():
-            if approval_data.get('status') == 'awaiting_custom_instruction':
-                # Process the custom instruction
-                escaped_action = self._escape_markdown(approval_data['action'])
-                escaped_instruction = self._escape_markdown(message_text)
-                
-                # Update the approval with custom instruction
-                approval_data['status'] = 'denied_custom'
-                approval_data['response'] = 'custom'
-                approval_data['instruction'] = f"✏️ **CUSTOM INSTRUCTION:** {escaped_instruction}"
-                # Save to database
-                self._save_approval_response(request_id, approval_data)
-                
-                # Send confirmation message
-                await self.send_notification(
-                    f"✅ **CUSTOM INSTRUCTION RECEIVED**\n\n**Original Action:** {escaped_action}\n\n**Your Instruction:** {escaped_instruction}\n\n**Status:** Custom instructions provided to agent",
-                    "high"
-                )
-                return  # Exit early since we processed the custom instruction
+        # First, check for custom instructions waiting for user input. In a group
+        # only replies to the prompt count, so ordinary chatter is not taken as one.
+        reply_to = update.message.reply_to_message
+        request_id = None
+        if reply_to is not None or chat.type == "private":
+            request_id = self.approval_responses.find_awaiting_instruction(
+                chat.id, reply_to.message_id if reply_to else None
+            )
+        if request_id is not None:
+            record = self.approval_responses.get(request_id)
+            # Update the approval with custom instruction; the agent gets the text exactly as typed
+            record.status = 'denied_custom'
+            record.response = 'custom'
+            record.instruction = f"✏️ **CUSTOM INSTRUCTION:** {message_text}"
+            self._complete_request(request_id)
+            await self._show_decision(record, decided_by=decided_by)
+            
+            # Send confirmation message
+            await self._send_formatted_notification(
+                INSTRUCTION_RECEIVED.render(action=ellipsize(record.action, ACTION_PREVIEW_SIZE),
+                                            instruction=ellipsize(message_text, INSTRUCTION_PREVIEW_SIZE)), "high"
+            )
+            return  # Exit early since we processed the custom instruction
         
-        # Parse approval responses like "approve approval_123" or "deny approval_123"
-        parts = message_text.lower().split()
+        # Parse approval responses like "approve approval_3f9c..." or "deny approval_3f9c..."
+        parts = message_text.split()
         if len(parts) >= 2:
-            action = parts[0]  # approve or deny
-            request_id = parts[1]  # approval_123
+            action = parts[0].lower()  # approve or deny
+            request_id = parts[1]  # approval_3f9c...
             
-            if request_id in self.approval_responses:
+            record = await self._find_record(request_id)
+            # The first answer wins; later ones from other chats are ignored
+            if record is not None and record.is_open:
                 if action in ['approve', 'approved', 'yes', 'ok']:
-                    self.approval_responses[request_id]['status'] = 'approved'
-                    self.approval_responses[request_id]['response'] = 'approved'
-                    # No need to save to database - immediate response
-                    await self.send_notification(f"✅ Approved: {self.approval_responses[request_id]['action']}", "high")
+                    record.status = 'approved'
+                    record.response = 'approved'
+                    self._complete_request(request_id)
+                    await self._show_typed_decision(record, decided_by)
+                    await self.send_notification(f"✅ Approved: {ellipsize(record.action, ACTION_PREVIEW_SIZE)}", "high")
                 elif action in ['deny', 'denied', 'no']:
-                    self.approval_responses[request_id]['status'] = 'denied'
-                    self.approval_responses[request_id]['response'] = 'denied'
-                    self.approval_responses[request_id]['instruction'] = 'Simple denial - no specific instructions provided'
-                    # No need to save to database - immediate response
-                    await self.send_notification(f"❌ Denied: {self.approval_responses[request_id]['action']}", "high")
+                    record.status = 'denied'
+                    record.response = 'denied'
+                    record.instruction = 'Simple denial - no specific instructions provided'
+                    self._complete_request(request_id)
+                    await self._show_typed_decision(record, decided_by)
+                    await self.send_notification(f"❌ Denied: {ellipsize(record.action, ACTION_PREVIEW_SIZE)}", "high")
         
     
     async def _handle_button_callback(self, update: Update, context):
@@ -265,47 +843,83 @@ class TelegramService:
         query = update.callback_query
         await query.answer()
         
-        if query.from_user.id != self.chat_id:
+        # Any chat approvals are routed to may answer them
+        chat_id = query.message.chat.id if query.message else query.from_user.id
+        if chat_id not in self.router.all_chats:
             return
+        decided_by = query.from_user.first_name
         
-        callback_data = query.data
-        
-        # Parse callback data for simplified actions
-        if any(callback_data.startswith(prefix) for prefix in ["approve_", "deny_", "suggest_"]):
-            parts = callback_data.split("_")
-            action_type = parts[0]  # approve, deny, or suggest
-            request_id = "_".join(parts[1:])  # approval_123
-            
-            if request_id in self.approval_responses:
-                if action_type == "approve":
-                    self.approval_responses[request_id]['status'] = 'approved'
-                    self.approval_responses[request_id]['response'] = 'approved'
-                    # No need to save to database - immediate response
-                    # Escape markdown in action text
-                    escaped_action = self._escape_markdown(self.approval_responses[request_id]['action'])
-                    await query.edit_message_text(
-                        f"✅ **APPROVED**\n\n**Action:** {escaped_action}\n**Status:** Approved by user",
-                        parse_mode="Markdown"
-                    )
+        decoded = decode_callback_data(query.data or "")
+        if decoded is None:
+            return
+        action_type, ref = decoded
+
+        if action_type == "approveall":
+            batch_id = ref
+            if batch_id not in self._batches:
+                await self._restore_batch(batch_id)
+            batch = self._batches.get(batch_id)
+            if batch is not None:
+                for request_id in batch['request_ids']:
+                    record = self.approval_responses.get(request_id)
+                    if record is not None and record.is_open:
+                        record.status = 'approved'
+                        record.response = 'approved'
+                        record.decided_by = decided_by
+                        self._complete_request(request_id)
+                await self._refresh_batch_message(query, batch_id)
+            return
+
+        if action_type == "page":
+            # Each copy pages on its own; only the pressed message is edited
+            request_id, _, page = ref.rpartition(':')
+            record = await self._find_record(request_id)
+            if record is None:
+                return
+            if not record.is_open:
+                await self._show_decision(record, query)
+                return
+            text, reply_markup = self._render_approval(request_id, record, int(page) if page.isdigit() else 0)
+            await self._edit_callback_message(query, text, parse_mode=PARSE_MODE, reply_markup=reply_markup)
+            return
+
+        if action_type in ("approve", "deny", "suggest"):
+            request_id = ref
+
+            record = await self._find_record(request_id)
+            if record is not None:
+                if record.batch_id is not None:
+                    # Batch items only offer approve and deny, and share one message
+                    if record.is_open and action_type in ("approve", "deny"):
+                        record.status = 'approved' if action_type == "approve" else 'denied'
+                        record.response = record.status
+                        self._complete_request(request_id)
+                    if record.batch_id not in self._batches:
+                        await self._restore_batch(record.batch_id)
+                    await self._refresh_batch_message(query, record.batch_id)
+                elif not record.is_open:
+                    # Already answered, possibly from another chat; the first answer stands
+                    await self._show_decision(record, query)
+                elif action_type == "approve":
+                    record.status = 'approved'
+                    record.response = 'approved'
+                    self._complete_request(request_id)
+                    await self._show_decision(record, query, decided_by)
                 elif action_type == "deny":
-                    self.approval_responses[request_id]['status'] = 'denied'
-                    self.approval_responses[request_id]['response'] = 'denied'
-                    self.approval_responses[request_id]['instruction'] = 'Simple denial - no specific instructions provided'
-                    # No need to save to database - immediate response
-                    # Escape markdown in action text
-                    escaped_action = self._escape_markdown(self.approval_responses[request_id]['action'])
-                    await query.edit_message_text(
-                        f"❌ **DENIED**\n\n**Action:** {escaped_action}\n**Status:** Simple denial",
-                        parse_mode="Markdown"
-                    )
+                    record.status = 'denied'
+                    record.response = 'denied'
+                    record.instruction = 'Simple denial - no specific instructions provided'
+                    self._complete_request(request_id)
+                    await self._show_decision(record, query, decided_by)
                 elif action_type == "suggest":
                     # Handle suggest different approach - wait for custom instruction
-                    self.approval_responses[request_id]['status'] = 'awaiting_custom_instruction'
-                    self.approval_responses[request_id]['response'] = 'awaiting_custom_instruction'
-                    # Save to database - this needs to persist for custom instruction workflow
-                    self._save_approval_response(request_id, self.approval_responses[request_id])
-                    escaped_action = self._escape_markdown(self.approval_responses[request_id]['action'])
-                    await query.edit_message_text(
-                        f"🔄 **SUGGEST DIFFERENT APPROACH**\n\n**Original Action:** {escaped_action}\n\n**Please type your suggestion for a different approach in your next message.**",
-                        parse_mode="Markdown"
+                    record.status = 'awaiting_custom_instruction'
+                    record.response = 'awaiting_custom_instruction'
+                    # Replies to this prompt are routed straight to this request
+                    self.approval_responses.await_instruction(
+                        request_id, chat_id, query.message.message_id if query.message else None
+                    )
+                    self._save_approval_response(request_id, record.to_dict())
+                    await self._edit_callback_message(
+                        query, SUGGEST.render(action=ellipsize(record.action, ACTION_PREVIEW_SIZE)), parse_mode=PARSE_MODE
                     )
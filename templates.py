@@ -0,0 +1,129 @@
+import html
+import re
+import string
+from config import PARSE_MODE
+
+# Characters with a meaning in MarkdownV2; the backslash comes first so the
+# escapes added for the others are not escaped again
+MARKDOWN_V2_SPECIAL = '\\_*[]()~`>#+-=|{}.!'
+BOLD = {
+    'HTML': ('<b>', '</b>'),
+    'MarkdownV2': ('*', '*'),
+    None: ('', '')
+}
+_HTML_TAG = re.compile(r'<[^>]*>')
+_MARKDOWN_V2_MARKUP = re.compile(r'\\(.)|[*_~|`]', re.DOTALL)
+_MARKDOWN_MARKUP = re.compile(r'\\(.)|[*_`]', re.DOTALL)
+
+
+# Chained str.replace rather than one str.translate: each replace is a C-speed
+# scan that skips characters the text doesn't contain, while translate looks
+# every character up in a dict. On CPython 3.11 translate was 3x (HTML) to
+# 5x (MarkdownV2) slower on a 1 KB diff; see tests/benchmark.py --templates-only.
+def _escape_html(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _escape_markdown_v2(text: str) -> str:
+    for char in MARKDOWN_V2_SPECIAL:
+        text = text.replace(char, '\\' + char)
+    return text
+
+
+def _no_escape(text: str) -> str:
+    return text
+
+
+ESCAPES = {
+    'HTML': _escape_html,
+    'MarkdownV2': _escape_markdown_v2,
+    None: _no_escape
+}
+
+if PARSE_MODE not in ('HTML', 'MarkdownV2'):
+    raise ValueError(f"TELEGRAM_PARSE_MODE must be HTML or MarkdownV2, not {PARSE_MODE!r}")
+
+
+def escape(text: str, parse_mode: str = PARSE_MODE) -> str:
+    """Escape text for parse_mode."""
+    return ESCAPES[parse_mode](text)
+
+
+def to_plain(text: str, parse_mode: str) -> str:
+    """Strip the markup from formatted text, leaving what the user would have read."""
+    if parse_mode == 'HTML':
+        return html.unescape(_HTML_TAG.sub('', text))
+    pattern = _MARKDOWN_V2_MARKUP if parse_mode == 'MarkdownV2' else _MARKDOWN_MARKUP
+    return pattern.sub(lambda match: match.group(1) or '', text)
+
+
+
+def ellipsize(text: str, limit: int) -> str:
+    """Shorten text to at most limit characters, ending in … if anything was cut."""
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rstrip() + '…'
+
+class Template:
+    """A message skeleton compiled once for a parse mode.
+
+    The source marks bold text with **...** and fields with {name}. When the
+    template is built, the literal text is escaped and its markup converted
+    into a str.format string, so rendering only escapes the field values and
+    runs one format_map. With parse_mode None the template renders plain text.
+    """
+
+    __slots__ = ('parse_mode', '_format', '_escape')
+
+    def __init__(self, source: str, parse_mode: str = PARSE_MODE):
+        self.parse_mode = parse_mode
+        self._escape = ESCAPES[parse_mode]
+        self._format = self._compile(source, parse_mode)
+
+    @staticmethod
+    def _compile(source: str, parse_mode: str) -> str:
+        opening, closing = BOLD[parse_mode]
+        escape_literal = ESCAPES[parse_mode]
+        parts = []
+        bold = False
+        for literal, field, _, _ in string.Formatter().parse(source):
+            for index, piece in enumerate(literal.split('**')):
+                if index:
+                    parts.append(closing if bold else opening)
+                    bold = not bold
+                parts.append(escape_literal(piece).replace('{', '{{').replace('}', '}}'))
+            if field is not None:
+                parts.append(f"{{{field}}}")
+        if bold:
+            raise ValueError(f"Unclosed ** in template: {source!r}")
+        return ''.join(parts)
+
+    def render(self, **fields) -> str:
+        """Fill in the fields, escaping each of them."""
+        escape = self._escape
+        for name, value in fields.items():
+            fields[name] = escape(value if value.__class__ is str else str(value))
+        return self._format.format_map(fields)
+
+
+PRIORITY = Template("{emoji} {message}", parse_mode=None)
+STATUS = Template("{emoji} **{status}**\n{message}")
+
+APPROVAL = Template("🤔 **APPROVAL REQUIRED**\n\n**Action:** {action}\n")
+APPROVAL_DETAILS = Template("🤔 **APPROVAL REQUIRED**\n\n**Action:** {action}\n**Details:** {details}\n")
+APPROVAL_PAGE = Template("🤔 **APPROVAL REQUIRED**\n\n**Action:** {action}\n**Details ({page}/{pages}):** {details}\n")
+APPROVED = Template("✅ **APPROVED**\n\n**Action:** {action}\n**Status:** Approved by {decided_by}")
+DENIED = Template("❌ **DENIED**\n\n**Action:** {action}\n**Status:** Simple denial{by}")
+DENIED_CUSTOM = Template("✏️ **DIFFERENT APPROACH REQUESTED**\n\n**Original Action:** {action}\n"
+                         "**Status:** Custom instructions provided{by}")
+SUGGEST = Template("🔄 **SUGGEST DIFFERENT APPROACH**\n\n**Original Action:** {action}\n\n"
+                   "**Please type your suggestion for a different approach in your next message.** "
+                   "If several suggestions are pending, reply to this message.")
+INSTRUCTION_RECEIVED = Template("✅ **CUSTOM INSTRUCTION RECEIVED**\n\n**Original Action:** {action}\n\n"
+                                "**Your Instruction:** {instruction}\n\n"
+                                "**Status:** Custom instructions provided to agent")
+
+BATCH_REQUIRED = Template("🤔 **BATCH APPROVAL REQUIRED**\n\n")
+BATCH_COMPLETE = Template("📋 **BATCH APPROVAL COMPLETE**\n\n")
+BATCH_DETAILS = Template("**Details:** {details}{more}\n\n")
+BATCH_ITEM = Template("{emoji} {index}. {action}")
@@ -0,0 +1,358 @@
+"""
+Offline throughput, latency and memory benchmark.
+
+Runs ToolHandler against the fake Bot API server in tests/fake_bot_api.py,
+so it needs no bot token, no network and no human. Reports:
+
+- notifications per second accepted by handle_tool_call and delivered by the outbox
+- p50/p99 time from a button press to request_approval returning
+- memory growth after 1k, 10k and 100k approval requests
+- HTTP connection reuse (requests per connection opened)
+- cold start: importing the MCP server and answering list_tools, checked
+  against a time budget
+- auto-approval policy evaluation, in microseconds per request
+- message rendering: precompiled templates against the old f-string and
+  per-field escaping, in microseconds per message
+
+Exits with status 1 when a section reports errors, a notification or
+approval goes missing, or startup is over budget, so it can gate CI.
+
+Usage:
+    python tests/benchmark.py
+    python tests/benchmark.py --sizes 1000,10000 --notifications 500 --approvals 100
+    python tests/benchmark.py --startup-only --startup-budget-ms 1500
+    python tests/benchmark.py --policy-only --policy-rules 1000
+    python tests/benchmark.py --templates-only
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotAPI
+
+CHAT_ID = 424242
+ACTION_PATTERN = re.compile(r"bench-(\d+)")
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: time from nothing imported to list_tools answered
+STARTUP_SCRIPT = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import mcp_telegram_tool
+asyncio.run(mcp_telegram_tool.list_tools())
+elapsed = time.perf_counter() - start
+heavy = [name for name in ("telegram", "telegram.ext", "sqlite3") if name in sys.modules]
+print(json.dumps({"ms": elapsed * 1000, "heavy": heavy}))
+"""
+
+
+def configure_environment(base_url: str, db_dir: str):
+    """Point the service at the fake server before config.py is imported."""
+    os.environ["TELEGRAM_BOT_TOKEN"] = "123456:FAKE-TOKEN"
+    os.environ["TELEGRAM_CHAT_ID"] = str(CHAT_ID)
+    os.environ["TELEGRAM_API_BASE_URL"] = base_url
+    os.environ["TELEGRAM_DB_PATH"] = os.path.join(db_dir, "benchmark.db")
+    # Measure the service itself, not Telegram's flood limits
+    os.environ.setdefault("TELEGRAM_RATE_LIMIT_GLOBAL", "0")
+    os.environ.setdefault("TELEGRAM_RATE_LIMIT_PER_CHAT", "0")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def approve_button(message: dict) -> str:
+    return message["reply_markup"]["inline_keyboard"][0][0]["callback_data"]
+
+
+def new_handler():
+    from handlers import ToolHandler
+    return ToolHandler()
+
+
+async def bench_notifications(fake: FakeBotAPI, count: int) -> bool:
+    """Concurrent send_notification calls per second, and how fast the outbox delivers them."""
+    handler = new_handler()
+    sent_before = fake.calls["sendMessage"]
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        handler.handle_tool_call("send_notification", {"message": f"note {i}", "priority": "normal"})
+        for i in range(count)
+    ])
+    accepted = time.perf_counter() - start
+    await handler.telegram.outbox.join()
+    delivered = time.perf_counter() - start
+    await handler.close()
+    errors = [result[0].text for result in results if not result[0].text.startswith("Notification sent")]
+    received = fake.calls["sendMessage"] - sent_before
+    print(f"notifications:   {count / accepted:10.1f} msg/s accepted, {count / delivered:.1f} msg/s delivered  "
+          f"({count} sent in {delivered:.2f}s, {len(errors)} errors)")
+    if errors:
+        print(f"  first error: {errors[0]}")
+    if received < count:
+        print(f"  FAILED: only {received} of {count} notifications reached the Bot API")
+    return not errors and received >= count
+
+
+async def bench_approval_latency(fake: FakeBotAPI, count: int) -> bool:
+    """Time from the user's button press to request_approval returning."""
+    handler = new_handler()
+    pressed_at = {}
+
+    async def press(message):
+        # Give the agent side a moment to start waiting, as a human would
+        await asyncio.sleep(0.01)
+        index = int(ACTION_PATTERN.search(message["text"]).group(1))
+        pressed_at[index] = time.perf_counter()
+        fake.inject_callback(message["message_id"], approve_button(message), CHAT_ID)
+
+    fake.on_message = lambda message: (
+        asyncio.get_running_loop().create_task(press(message)) if "reply_markup" in message else None
+    )
+
+    async def request(index):
+        result = await handler.handle_tool_call("request_approval", {"action": f"bench-{index}", "timeout": 60})
+        if index not in pressed_at or not result[0].text.startswith("✅"):
+            return result[0].text
+        return time.perf_counter() - pressed_at[index]
+
+    results = await asyncio.gather(*[request(i) for i in range(count)])
+    fake.on_message = None
+    await handler.close()
+    latencies_ms = [result * 1000 for result in results if isinstance(result, float)]
+    errors = [result for result in results if isinstance(result, str)]
+    if latencies_ms:
+        print(f"approval latency: p50 {percentile(latencies_ms, 50):7.2f} ms  "
+              f"p99 {percentile(latencies_ms, 99):7.2f} ms  "
+              f"mean {statistics.mean(latencies_ms):7.2f} ms  ({len(latencies_ms)} approvals, {len(errors)} errors)")
+    else:
+        print("approval latency: FAILED: no approval was answered")
+    if errors:
+        print(f"  first error: {errors[0]}")
+    return not errors and len(latencies_ms) == count
+
+
+def resident_memory() -> int:
+    """Current resident set size in bytes (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def bench_memory(fake: FakeBotAPI, size: int, trace: bool, concurrency: int = 200) -> bool:
+    """Memory retained by the service after `size` approvals were created and decided."""
+    handler = new_handler()
+    await handler.telegram._ensure_listening()
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+    else:
+        baseline = resident_memory()
+
+    fake.on_message = lambda message: (
+        fake.inject_callback(message["message_id"], approve_button(message), CHAT_ID)
+        if "reply_markup" in message else None
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(index):
+        async with semaphore:
+            result = await handler.handle_tool_call("request_approval", {"action": f"bench-{index}", "timeout": 60})
+            return result[0].text.startswith("✅")
+
+    start = time.perf_counter()
+    approved = sum(await asyncio.gather(*[request(i) for i in range(size)]))
+    elapsed = time.perf_counter() - start
+    fake.on_message = None
+
+    gc.collect()
+    if trace:
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+    else:
+        retained = resident_memory() - baseline
+    await handler.close()
+    print(f"memory @ {size:>7}: {'traced' if trace else 'RSS'} growth {retained / 1024 / 1024:8.2f} MiB "
+          f"({retained / size:8.1f} B/request), {size / elapsed:8.1f} approvals/s")
+    if approved < size:
+        print(f"  FAILED: only {approved} of {size} approvals were answered")
+    return approved == size
+
+
+def bench_startup(runs: int, budget_ms: float) -> bool:
+    """Cold start of the MCP server, best of `runs` fresh interpreters."""
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=PROJECT_DIR, env=os.environ,
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    best = min(result["ms"] for result in results)
+    heavy = results[0]["heavy"]
+    within_budget = best <= budget_ms and not heavy
+    print(f"startup:         {best:7.1f} ms to list_tools (budget {budget_ms:.0f} ms, "
+          f"median {statistics.median(result['ms'] for result in results):.1f} ms) "
+          f"{'OK' if within_budget else 'OVER BUDGET'}")
+    if heavy:
+        print(f"  imported before first tool call: {', '.join(heavy)}")
+    return within_budget
+
+
+def bench_policy(rule_count: int, calls: int):
+    """Time ApprovalPolicy.evaluate against a synthetic rule set.
+
+    Three rules in four are action prefixes and the rest are '^'-anchored
+    regexes; both are indexed by prefix, so the cost should stay flat as the
+    rule count grows.
+    """
+    from policy import ApprovalPolicy
+    rules = []
+    for index in range(rule_count):
+        decision = ("approve", "deny", "escalate")[index % 3]
+        if index % 4 == 3:
+            rules.append({"name": f"pattern-{index}", "decision": decision,
+                          "action_pattern": rf"^deploy service-{index}\b"})
+        else:
+            rules.append({"name": f"prefix-{index}", "decision": decision, "action_prefix": f"tool-{index} "})
+    policy = ApprovalPolicy(rules)
+
+    cases = {
+        "prefix hit": f"tool-{rule_count // 2} run --fast",
+        "regex hit": f"deploy service-{rule_count - 1} to staging",
+        "no match": "rewrite the README introduction",
+    }
+    for label, action in cases.items():
+        evaluate = policy.evaluate
+        start = time.perf_counter()
+        for _ in range(calls):
+            evaluate(action, "details")
+        elapsed = time.perf_counter() - start
+        rule = evaluate(action, "details")
+        print(f"policy {label:>10}: {elapsed / calls * 1e6:7.2f} µs/request "
+              f"({rule_count} rules, decided by {rule.name if rule else 'no rule'})")
+
+
+def _legacy_escape(text: str) -> str:
+    # The escaping used before templates, kept here as the baseline
+    return text.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
+
+
+def bench_templates(calls: int):
+    """Time rendering progress and approval messages.
+
+    The baseline escapes each field with four chained str.replace calls and
+    builds the message with an f-string, as the service used to; templates
+    escape only the field values and fill in a precompiled format string.
+    """
+    from templates import Template
+    message = "Running `pytest -q` in tests/integration_suite [shard 3 of 8] for *all* targets"
+    action = "Deploy build_2024 to production (blue/green)"
+    details = "\n".join(f"+ changed line {index}: value_{index} = compute(*args) [ok]" for index in range(18))
+
+    def legacy_progress():
+        return f"📝 **{_legacy_escape('IN_PROGRESS')}**\n{_legacy_escape(message)}"
+
+    def legacy_approval():
+        return (f"🤔 **APPROVAL REQUIRED**\n\n**Action:** {_legacy_escape(action)}\n"
+                f"**Details:** {_legacy_escape(details)}\n")
+
+    cases = [("progress", "legacy", legacy_progress), ("approval", "legacy", legacy_approval)]
+    for parse_mode in ("HTML", "MarkdownV2"):
+        status = Template("{emoji} **{status}**\n{message}", parse_mode)
+        approval = Template("🤔 **APPROVAL REQUIRED**\n\n**Action:** {action}\n**Details:** {details}\n", parse_mode)
+        cases.append(("progress", parse_mode,
+                      lambda status=status: status.render(emoji="📝", status="IN_PROGRESS", message=message)))
+        cases.append(("approval", parse_mode,
+                      lambda approval=approval: approval.render(action=action, details=details)))
+    cases.sort(key=lambda case: case[0])
+
+    for kind, label, render in cases:
+        start = time.perf_counter()
+        for _ in range(calls):
+            render()
+        elapsed = time.perf_counter() - start
+        print(f"render {kind:>8} {label:>10}: {elapsed / calls * 1e6:6.2f} µs/message ({len(render())} chars)")
+
+
+async def run_benchmarks(args) -> bool:
+    """Run every section; False if any of them failed or lost messages."""
+    fake = FakeBotAPI(record_messages=False)
+    base_url = await fake.start()
+    with tempfile.TemporaryDirectory() as db_dir:
+        configure_environment(base_url, db_dir)
+        print("=" * 60)
+        print("TELEGRAM MCP AGENT - OFFLINE BENCHMARK")
+        print("=" * 60)
+        ok = bench_startup(args.startup_runs, args.startup_budget_ms)
+        bench_policy(args.policy_rules, args.policy_calls)
+        bench_templates(args.template_calls)
+        ok &= await bench_notifications(fake, args.notifications)
+        ok &= await bench_approval_latency(fake, args.approvals)
+        for size in args.sizes:
+            ok &= await bench_memory(fake, size, args.tracemalloc)
+        print(f"\nBot API calls: {dict(fake.calls)}")
+        requests = sum(fake.calls.values())
+        print(f"HTTP connections opened: {fake.connections} "
+              f"({requests / max(1, fake.connections):.1f} requests per connection)")
+    await fake.stop()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notifications", type=int, default=2000)
+    parser.add_argument("--approvals", type=int, default=500)
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[1000, 10000, 100000])
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="measure retained Python allocations instead of RSS (much slower)")
+    parser.add_argument("--startup-runs", type=int, default=5)
+    parser.add_argument("--startup-budget-ms", type=float, default=1500,
+                        help="fail --startup-only if cold start to list_tools exceeds this")
+    parser.add_argument("--startup-only", action="store_true",
+                        help="only measure cold start; exit status 1 when over budget")
+    parser.add_argument("--policy-rules", type=int, default=500)
+    parser.add_argument("--policy-calls", type=int, default=100000)
+    parser.add_argument("--policy-only", action="store_true",
+                        help="only measure auto-approval policy evaluation")
+    parser.add_argument("--template-calls", type=int, default=100000)
+    parser.add_argument("--templates-only", action="store_true",
+                        help="only measure message rendering")
+    args = parser.parse_args()
+    if args.templates_only:
+        with tempfile.TemporaryDirectory() as db_dir:
+            configure_environment("http://127.0.0.1:9/bot", db_dir)
+            bench_templates(args.template_calls)
+        return
+    if args.policy_only:
+        sys.path.insert(0, PROJECT_DIR)
+        bench_policy(args.policy_rules, args.policy_calls)
+        return
+    if args.startup_only:
+        with tempfile.TemporaryDirectory() as db_dir:
+            configure_environment("http://127.0.0.1:9/bot", db_dir)
+            sys.exit(0 if bench_startup(args.startup_runs, args.startup_budget_ms) else 1)
+    # Non-zero when any section had errors, so CI catches broken delivery or approvals
+    sys.exit(0 if asyncio.run(run_benchmarks(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+# test_all_features.py and test_telegram_service.py need a live bot and a
+# human at the keyboard, and benchmark.py is a CLI; pytest runs only the
+# offline tests (run the others with run_tests.py)
+collect_ignore = ["test_all_features.py", "test_telegram_service.py", "benchmark.py"]
@@ -0,0 +1,326 @@
+"""
+Offline stand-in for the Telegram Bot API.
+
+Serves the handful of Bot API methods this project uses over plain HTTP on
+localhost, so TelegramService can be pointed at it with
+TELEGRAM_API_BASE_URL and exercised without a real bot or a human. Updates
+(button presses and text messages) are injected from Python, and latency and
+429 flood errors can be simulated.
+"""
+import asyncio
+import itertools
+import json
+import re
+import time
+from collections import Counter, deque
+from email.parser import BytesParser
+from urllib.parse import parse_qsl
+
+BOT_USER = {"id": 1000, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+
+_HTML_TAGS = {"b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "a", "code", "pre",
+              "tg-spoiler", "span", "blockquote"}
+_HTML_TOKEN = re.compile(r"<(/?)([a-z-]+)[^<>]*>|&(?:amp|lt|gt|quot|#\d+);|[<>&]")
+_MARKDOWN_V2_SPECIAL = set("_*[]()~`>#+-=|{}.!")
+
+# Form fields PTB sends JSON-encoded; everything else is sent as a raw string
+_JSON_FIELDS = {
+    "chat_id", "message_id", "reply_markup", "timeout", "offset", "limit",
+    "allowed_updates", "reply_to_message_id", "reply_parameters", "media",
+    "disable_notification", "show_alert", "cache_time", "entities"
+}
+
+
+class FakeBotAPI:
+    """Minimal in-process Bot API server.
+
+    Args:
+        latency: Seconds added to every API call.
+        flood_every: Answer every Nth send/edit call with HTTP 429 (0 disables).
+        retry_after: retry_after value reported with simulated 429s.
+        record_messages: Keep sent messages for later edits and inspection.
+            Turn off for long runs so the fake server's memory stays flat.
+
+    Set `errors` to {method: description} to answer those methods with a 400
+    Bad Request, e.g. {"sendMessage": "chat not found"}.
+    """
+
+    def __init__(self, latency: float = 0.0, flood_every: int = 0, retry_after: int = 1,
+                 record_messages: bool = True):
+        self.latency = latency
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.record_messages = record_messages
+        self.calls = Counter()
+        self.connections = 0
+        self.messages = {}
+        self.on_message = None
+        self.errors = {}
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+        self._updates = deque()
+        self._updates_changed = asyncio.Event()
+        self._flood_counter = 0
+        self._server = None
+        self.base_url = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL to give to the Bot."""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        port = self._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}/bot"
+        return self.base_url
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    # ------------------------------------------------------------------
+    # Update injection
+    # ------------------------------------------------------------------
+
+    def inject_callback(self, message_id: int, data: str, chat_id: int, user_id: int = None):
+        """Simulate the user pressing an inline button."""
+        message = self.messages.get((chat_id, message_id)) or self._message(chat_id, "", message_id)
+        user = self._user(user_id or chat_id)
+        self._push_update({
+            "callback_query": {
+                "id": str(next(self._callback_ids)),
+                "from": user,
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": message
+            }
+        })
+
+    def inject_message(self, text: str, chat_id: int, reply_to_message_id: int = None):
+        """Simulate the user typing a message in the private chat."""
+        message = self._message(chat_id, text, next(self._message_ids))
+        message["from"] = self._user(chat_id)
+        if reply_to_message_id is not None:
+            message["reply_to_message"] = self.messages.get(
+                (chat_id, reply_to_message_id), self._message(chat_id, "", reply_to_message_id)
+            )
+        self._push_update({"message": message})
+
+    def _push_update(self, update: dict):
+        update["update_id"] = next(self._update_ids)
+        self._updates.append(update)
+        self._updates_changed.set()
+
+    @staticmethod
+    def _user(user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": "Tester"}
+
+    @staticmethod
+    def _message(chat_id: int, text: str, message_id: int) -> dict:
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Tester"},
+            "text": text
+        }
+
+    # ------------------------------------------------------------------
+    # HTTP handling
+    # ------------------------------------------------------------------
+
+    async def _handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                path = request_line.split()[1].decode()
+                method = path.rsplit("/", 1)[-1]
+                params = self._parse_params(headers.get("content-type", ""), body)
+                status, payload = await self._call(method, params)
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_params(content_type: str, body: bytes) -> dict:
+        if content_type.startswith("multipart/form-data"):
+            message = BytesParser().parsebytes(
+                b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+            )
+            params = {}
+            for part in message.get_payload():
+                name = part.get_param("name", header="content-disposition")
+                filename = part.get_filename()
+                content = part.get_payload(decode=True)
+                if filename:
+                    params[name] = {"filename": filename, "size": len(content)}
+                else:
+                    params[name] = content.decode()
+        else:
+            params = dict(parse_qsl(body.decode()))
+        for key in _JSON_FIELDS & params.keys():
+            if isinstance(params[key], str):
+                try:
+                    params[key] = json.loads(params[key])
+                except ValueError:
+                    pass
+        return params
+
+    async def _call(self, method: str, params: dict):
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": await self._get_updates(params)}
+
+        if self.flood_every and method.startswith(("send", "edit")):
+            self._flood_counter += 1
+            if self._flood_counter % self.flood_every == 0:
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after}
+                }
+
+        if method in self.errors:
+            return 400, {"ok": False, "error_code": 400, "description": f"Bad Request: {self.errors[method]}"}
+
+        error = self._markup_error(params.get("text"), params.get("parse_mode"))
+        if error:
+            return 400, {"ok": False, "error_code": 400, "description": f"Bad Request: can't parse entities: {error}"}
+
+        handler = getattr(self, f"_api_{method}", None)
+        if handler is None:
+            return 200, {"ok": True, "result": True}
+        return 200, {"ok": True, "result": handler(params)}
+
+    @staticmethod
+    def _markup_error(text, parse_mode):
+        """Roughly what Telegram rejects: unknown or unbalanced HTML tags and bare
+        <, > or &; in MarkdownV2, special characters that are not escaped or bold."""
+        if not text or parse_mode not in ("HTML", "MarkdownV2"):
+            return None
+        if parse_mode == "HTML":
+            open_tags = []
+            for match in _HTML_TOKEN.finditer(text):
+                if match.group(2) is None:
+                    if match.group(0) in "<>&":
+                        return f"unescaped '{match.group(0)}' at offset {match.start()}"
+                    continue
+                closing, tag = match.group(1), match.group(2)
+                if tag not in _HTML_TAGS:
+                    return f"unsupported tag '{tag}'"
+                if not closing:
+                    open_tags.append(tag)
+                elif not open_tags or open_tags.pop() != tag:
+                    return f"unmatched end tag '{tag}'"
+            return f"unclosed tag '{open_tags[-1]}'" if open_tags else None
+        bold = False
+        escaped = False
+        for offset, char in enumerate(text):
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == "*":
+                bold = not bold
+            elif char in _MARKDOWN_V2_SPECIAL:
+                return f"character '{char}' is reserved and must be escaped at offset {offset}"
+        return "unclosed bold entity" if bold else None
+
+    async def _get_updates(self, params: dict) -> list:
+        offset = int(params.get("offset") or 0)
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates:
+            self._updates_changed.clear()
+            try:
+                await asyncio.wait_for(self._updates_changed.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return list(itertools.islice(self._updates, limit))
+
+    # ------------------------------------------------------------------
+    # Bot API methods
+    # ------------------------------------------------------------------
+
+    def _api_getMe(self, params):
+        return dict(BOT_USER, can_join_groups=True, can_read_all_group_messages=False,
+                    supports_inline_queries=False)
+
+    def _api_sendMessage(self, params):
+        chat_id = int(params["chat_id"])
+        message = self._message(chat_id, params.get("text", ""), next(self._message_ids))
+        message["from"] = BOT_USER
+        if "reply_markup" in params:
+            message["reply_markup"] = params["reply_markup"]
+        if self.record_messages:
+            self.messages[(chat_id, message["message_id"])] = message
+        if self.on_message is not None:
+            self.on_message(message)
+        return message
+
+    def _api_sendDocument(self, params):
+        document = params.get("document")
+        message = self._api_sendMessage({"chat_id": params["chat_id"], "text": ""})
+        message.pop("text")
+        if params.get("caption"):
+            message["caption"] = params["caption"]
+        message["document"] = self._document(document)
+        return message
+
+    def _api_sendMediaGroup(self, params):
+        messages = []
+        for item in params["media"]:
+            media = item["media"]
+            if isinstance(media, str) and media.startswith("attach://"):
+                media = params.get(media[len("attach://"):])
+            message = self._api_sendDocument({"chat_id": params["chat_id"], "document": media,
+                                              "caption": item.get("caption")})
+            messages.append(message)
+        return messages
+
+    def _document(self, upload) -> dict:
+        upload = upload if isinstance(upload, dict) else {"filename": str(upload), "size": 0}
+        file_id = f"file{next(self._message_ids)}"
+        return {"file_id": file_id, "file_unique_id": file_id,
+                "file_name": upload["filename"], "file_size": upload["size"]}
+
+    def _api_editMessageText(self, params):
+        chat_id = int(params["chat_id"])
+        message_id = int(params["message_id"])
+        message = self.messages.get((chat_id, message_id)) or self._message(chat_id, "", message_id)
+        message = dict(message, text=params.get("text", ""), edit_date=int(time.time()))
+        if "reply_markup" in params:
+            message["reply_markup"] = params["reply_markup"]
+        else:
+            message.pop("reply_markup", None)
+        message["from"] = BOT_USER
+        if self.record_messages:
+            self.messages[(chat_id, message_id)] = message
+        return message
+
+    def _api_answerCallbackQuery(self, params):
+        return True
@@ -43,7 +43,7 @@ async def test_all_features():
     
     while time.time() - start_time < timeout:
         await asyncio.sleep(2)
-        status = service.get_approval_status(request_id)
+        status = await service.get_approval_status(request_id)
         
         if status['status'] != 'pending':
             print(f"  OK: You clicked something! Status: {status['status']}")
@@ -0,0 +1,265 @@
+"""
+Offline behaviour tests against the fake Bot API in tests/fake_bot_api.py.
+
+Needs no bot token, no network and no human, so it can gate CI. Run with
+pytest, or directly:
+
+    python -m pytest tests/test_offline.py
+    python tests/test_offline.py
+"""
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotAPI
+
+CHAT_ID = 424242
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# config.py reads the environment once, so every test shares one fake server
+# address and database; each test starts its own server on that port
+PORT = _free_port()
+DB_DIR = tempfile.mkdtemp(prefix="telegram-mcp-test-")
+os.environ.update({
+    "TELEGRAM_BOT_TOKEN": "123456:FAKE-TOKEN",
+    "TELEGRAM_CHAT_ID": str(CHAT_ID),
+    "TELEGRAM_API_BASE_URL": f"http://127.0.0.1:{PORT}/bot",
+    "TELEGRAM_DB_PATH": os.path.join(DB_DIR, "test.db"),
+    "TELEGRAM_RATE_LIMIT_GLOBAL": "0",
+    "TELEGRAM_RATE_LIMIT_PER_CHAT": "0",
+    "TELEGRAM_PROGRESS_EDIT_INTERVAL": "0",
+})
+
+from digest import NotificationDigest
+from progress import ProgressUpdater
+from handlers import ToolHandler
+
+
+def run(scenario, **fake_options):
+    """Run scenario(fake, handler) against a fresh fake Bot API and tool handler."""
+    async def main():
+        fake = FakeBotAPI(**fake_options)
+        await fake.start(port=PORT)
+        handler = ToolHandler()
+        try:
+            await scenario(fake, handler)
+        finally:
+            await handler.close()
+            await fake.stop()
+    asyncio.run(main())
+
+
+def press_when_sent(fake: FakeBotAPI, row: int = 0, column: int = 0, delay: float = 0.05):
+    """Press a button on every message with a keyboard, as a user would."""
+    async def press(message):
+        await asyncio.sleep(delay)
+        data = message["reply_markup"]["inline_keyboard"][row][column]["callback_data"]
+        fake.inject_callback(message["message_id"], data, CHAT_ID)
+
+    fake.on_message = lambda message: (
+        asyncio.get_running_loop().create_task(press(message)) if "reply_markup" in message else None
+    )
+
+
+def texts(fake: FakeBotAPI) -> list:
+    return [message.get("text", "") for message in fake.messages.values()]
+
+
+def test_notifications_are_delivered():
+    async def scenario(fake, handler):
+        for index in range(20):
+            result = await handler.handle_tool_call("send_notification", {"message": f"note {index}"})
+            assert result[0].text.startswith("Notification sent"), result[0].text
+        await handler.telegram.outbox.join()
+        sent = [text.split(" ", 1)[1] for text in texts(fake) if "note" in text]
+        assert sent == [f"note {index}" for index in range(20)]
+    run(scenario)
+
+
+def test_digest_notifications_say_they_are_queued():
+    async def scenario(fake, handler):
+        telegram = handler.telegram
+        telegram.digest = NotificationDigest(telegram._send_digest, interval=0.1)
+        for priority in ("normal", "normal", "high"):
+            result = await handler.handle_tool_call("send_notification", {"message": "tick", "priority": priority})
+        assert result[0].text.startswith("Notification sent"), result[0].text
+        result = await handler.handle_tool_call("send_notification", {"message": "tock", "priority": "low"})
+        assert result[0].text == "Notification queued for digest: tock"
+        await asyncio.sleep(0.3)
+        await telegram.outbox.join()
+        digest = next(text for text in texts(fake) if "Digest" in text)
+        assert "tick (×2)" in digest and "tock" in digest
+    run(scenario)
+
+
+def test_approval_is_answered_by_button():
+    async def scenario(fake, handler):
+        press_when_sent(fake)
+        result = await handler.handle_tool_call("request_approval", {"action": "deploy to staging", "timeout": 10})
+        assert result[0].text == "✅ User approved: deploy to staging"
+        # The buttons are replaced with the decision
+        await asyncio.sleep(0.2)
+        message = next(message for message in fake.messages.values() if "deploy" in message.get("text", ""))
+        assert "APPROVED" in message["text"] and "reply_markup" not in message
+    run(scenario)
+
+
+def test_suggestion_reaches_agent_as_typed():
+    async def scenario(fake, handler):
+        result = await handler.handle_tool_call(
+            "request_approval", {"action": "drop table", "wait_for_response": False})
+        request_id = result[0].text.split("ID: ")[1].rstrip(")")
+        await asyncio.sleep(0.1)
+        prompt = next(message for message in fake.messages.values() if "reply_markup" in message)
+        fake.inject_callback(prompt["message_id"], prompt["reply_markup"]["inline_keyboard"][1][1]["callback_data"],
+                             CHAT_ID)
+        await asyncio.sleep(0.3)
+        fake.inject_message("archive it *first* <please>", CHAT_ID)
+        result = await handler.handle_tool_call("check_approval_status",
+                                                {"request_id": request_id, "wait_seconds": 5})
+        assert "denied with custom instructions" in result[0].text
+        assert "archive it *first* <please>" in result[0].text
+    run(scenario)
+
+
+def test_batch_approve_all():
+    async def scenario(fake, handler):
+        press_when_sent(fake, row=-1)
+        result = await handler.handle_tool_call("request_approvals_batch",
+                                                {"actions": ["build", "test", "deploy"], "timeout": 10})
+        assert result[0].text.count("✅") >= 3, result[0].text
+        await asyncio.sleep(0.2)
+        message = next(message for message in fake.messages.values() if "BATCH" in message.get("text", ""))
+        assert "BATCH APPROVAL COMPLETE" in message["text"] and "reply_markup" not in message
+        # Recorded as the presser's decision, like pressing each item's button
+        request_ids = [line.rsplit("ID: ", 1)[1].rstrip(")") for line in result[0].text.splitlines() if "ID: " in line]
+        assert [handler.telegram.approval_responses.get(request_id).decided_by for request_id in request_ids] == \
+            ["Tester"] * 3
+    run(scenario)
+
+
+def test_batch_size_is_checked_before_quorum():
+    async def scenario(fake, handler):
+        for actions, error in (([], "At least one action is required"),
+                               ([f"step {index}" for index in range(21)], "at most 20 actions, not 21")):
+            result = await handler.handle_tool_call("request_approvals_batch", {"actions": actions, "mode": "quorum"})
+            assert error in result[0].text, result[0].text
+        assert fake.calls["sendMessage"] == 0
+    run(scenario)
+
+
+def test_long_actions_fit_in_one_message():
+    async def scenario(fake, handler):
+        press_when_sent(fake)
+        long_action = "rm -rf " + "build/" * 1000
+        result = await handler.handle_tool_call("request_approval",
+                                                {"action": long_action, "details": "x" * 5000, "timeout": 10})
+        # The agent still gets the action back in full
+        assert result[0].text == f"✅ User approved: {long_action}"
+        press_when_sent(fake, row=-1)
+        result = await handler.handle_tool_call("request_approvals_batch",
+                                                {"actions": [f"{index} {long_action}" for index in range(20)],
+                                                 "details": "y" * 5000, "timeout": 10})
+        assert result[0].text.count(long_action) == 20
+        await asyncio.sleep(0.2)
+        assert fake.calls["sendMessage"] == 2
+        assert max(map(len, texts(fake))) <= 4096
+    run(scenario)
+
+
+def test_failed_approval_send_leaves_nothing_pending():
+    async def scenario(fake, handler):
+        fake.errors["sendMessage"] = "chat not found"
+        telegram = handler.telegram
+        before = len(telegram.approval_responses)
+        for tool, arguments in (("request_approval", {"action": "unsendable", "wait_for_response": False}),
+                                ("request_approvals_batch", {"actions": ["one", "two"], "wait_for_response": False})):
+            result = await handler.handle_tool_call(tool, arguments)
+            assert "chat not found" in result[0].text.lower(), result[0].text
+        # Nobody could answer them, so they must not linger as open requests
+        assert len(telegram.approval_responses) == before
+        assert not list(telegram.approval_responses.open_items())
+        assert not telegram._batches
+        await telegram.store.flush()
+        stored = await telegram.store.load_open()
+        assert not [row for row in stored.values() if row["action"] in ("unsendable", "one", "two")]
+    run(scenario)
+
+
+def test_foreign_markup_is_sent_as_plain_text_first_time():
+    async def scenario(fake, handler):
+        # As queued by a version that used another parse mode
+        await handler.telegram.outbox.put("normal", chat_id=CHAT_ID, text="*old* entry (v1).",
+                                          parse_mode="MarkdownV2")
+        await handler.telegram.outbox.join()
+        assert fake.calls["sendMessage"] == 1
+        assert texts(fake) == ["old entry (v1)."]
+    run(scenario)
+
+
+def test_progress_edits_one_message():
+    async def scenario(fake, handler):
+        for step in range(3):
+            await handler.handle_tool_call("notify_progress",
+                                           {"message": f"step {step}", "status": "in_progress", "task_id": "build"})
+        await handler.handle_tool_call("notify_progress",
+                                       {"message": "done", "status": "completed", "task_id": "build"})
+        await asyncio.sleep(0.3)
+        assert fake.calls["sendMessage"] == 1
+        assert texts(fake)[0].endswith("done")
+    run(scenario)
+
+
+
+def test_unfinished_progress_tasks_are_bounded():
+    async def main():
+        sent = []
+        edited = []
+
+        async def send(task_id, text):
+            sent.append(task_id)
+            return type("Message", (), {"message_id": len(sent)})()
+
+        async def edit(task_id, message_id, text):
+            edited.append(task_id)
+
+        progress = ProgressUpdater(send, edit, interval=60, max_tasks=3, ttl=0.1)
+        for task_id in ("a", "b", "c", "d"):
+            await progress.update(task_id, "started")
+        # Least recently updated goes first
+        assert len(progress) == 3
+        await asyncio.sleep(0.2)
+        await progress.update("e", "started")
+        # The others sat idle past the TTL
+        assert len(progress) == 1
+
+        # An edit waiting out its interval is cancelled, not sent, on close
+        await progress.update("e", "halfway")
+        await progress.close()
+        assert len(progress) == 0
+        await asyncio.sleep(0)
+        assert edited == []
+    asyncio.run(main())
+
+if __name__ == "__main__":
+    failures = 0
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            try:
+                test()
+                print(f"PASS {name}")
+            except Exception as e:
+                failures += 1
+                print(f"FAIL {name}: {e!r}")
+    sys.exit(1 if failures else 0)
@@ -63,7 +63,7 @@ async def test_approval_system():
     
     request_id = await service.create_approval_request("Pet a cute cat", "A friendly cat wants some attention and pets")
     print(f"Approval request created with ID: {request_id}")
-    print(f"Initial status: {service.get_approval_status(request_id)['status']}")
+    print(f"Initial status: {(await service.get_approval_status(request_id))['status']}")
     
     print("\n" + "=" * 60)
     print("WAITING FOR YOUR ACTION IN TELEGRAM:")
@@ -79,7 +79,7 @@ async def test_approval_system():
     
     while time.time() - start_time < timeout:
         await asyncio.sleep(2)
-        status = service.get_approval_status(request_id)
+        status = await service.get_approval_status(request_id)
         current_status = status['status']
         
         if current_status == 'approved':
@@ -114,7 +114,7 @@ async def test_approval_system():
     
     request_id2 = await service.create_approval_request("Wipe entire disk permanently", "Delete ALL files on the computer including system files, personal documents, and backups. This action cannot be undone.")
     print(f"Approval request created with ID: {request_id2}")
-    print(f"Initial status: {service.get_approval_status(request_id2)['status']}")
+    print(f"Initial status: {(await service.get_approval_status(request_id2))['status']}")
     
     print("\n" + "=" * 60)
     print("WAITING FOR YOUR ACTION IN TELEGRAM:")
@@ -129,7 +129,7 @@ async def test_approval_system():
     
     while time.time() - start_time < timeout:
         await asyncio.sleep(2)
-        status = service.get_approval_status(request_id2)
+        status = await service.get_approval_status(request_id2)
         current_status = status['status']
         
         if current_status == 'approved':
@@ -164,7 +164,7 @@ async def test_approval_system():
     
     request_id3 = await service.create_approval_request("Deploy directly to production on Friday at 5PM", "Push new untested code straight to production servers during peak hours on Friday evening")
     print(f"Approval request created with ID: {request_id3}")
-    print(f"Initial status: {service.get_approval_status(request_id3)['status']}")
+    print(f"Initial status: {(await service.get_approval_status(request_id3))['status']}")
     
     print("\n" + "=" * 60)
     print("WAITING FOR YOUR ACTION IN TELEGRAM:")
@@ -180,7 +180,7 @@ async def test_approval_system():
     
     while time.time() - start_time < timeout:
         await asyncio.sleep(2)
-        status = service.get_approval_status(request_id3)
+        status = await service.get_approval_status(request_id3)
         current_status = status['status']
         
         if current_status == 'approved':
@@ -215,7 +215,7 @@ async def test_approval_system():
         
         while time.time() - start_time < timeout:
             await asyncio.sleep(2)
-            status = service.get_approval_status(request_id3)
+            status = await service.get_approval_status(request_id3)
             if status['status'] == 'denied_custom':
                 print(f"\n[PASS] Custom instruction received!")
                 instruction = status.get('instruction', 'No instruction')
@@ -236,8 +236,10 @@ async def test_approval_system():
     
     # Only test persistence if we have a custom instruction
     if 'request_id3' in locals():
+        # Make sure buffered writes reach the database before opening a second instance
+        await service.store.flush()
         service2 = TelegramService()
-        persisted_status = service2.get_approval_status(request_id3)
+        persisted_status = await service2.get_approval_status(request_id3)
         
         print(f"Persisted status: {persisted_status['status']}")
         if persisted_status['status'] == 'denied_custom':
@@ -256,7 +258,7 @@ async def test_approval_system():
     print("TEST 7: ERROR HANDLING")
     print("=" * 50)
     
-    fake_status = service.get_approval_status("non_existent_id")
+    fake_status = await service.get_approval_status("non_existent_id")
     print(f"Non-existent request status: {fake_status['status']}")
     if fake_status['status'] == 'not_found':
         print("[PASS] Error handling working correctly!")
@@ -1,4 +1,5 @@
 from mcp.types import Tool
+from config import MAX_BATCH_SIZE
 
 def get_tools() -> list[Tool]:
     """Define available MCP tools."""
@@ -17,6 +18,10 @@ def get_tools() -> list[Tool]:
                         "type": "string",
                         "enum": ["started", "in_progress", "completed", "error"],
                         "description": "Status of the current task"
+                    },
+                    "task_id": {
+                        "type": "string",
+                        "description": "Optional task identifier. Updates with the same task_id edit a single message instead of sending new ones"
                     }
                 },
                 "required": ["message", "status"]
@@ -50,6 +55,48 @@ def get_tools() -> list[Tool]:
                 "required": ["action"]
             }
         ),
+        Tool(
+            name="request_approvals_batch",
+            description="Request approval for several actions at once. All actions are shown in a single Telegram message with Approve/Deny buttons per action and an 'Approve all' button, and one call waits for the decisions. Returns the decision for each action.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "actions": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "minItems": 1,
+                        "maxItems": MAX_BATCH_SIZE,
+                        "description": "Descriptions of the actions requiring approval"
+                    },
+                    "details": {
+                        "type": "string",
+                        "description": "Additional details about the batch as a whole"
+                    },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["all", "any", "quorum"],
+                        "description": "When to return: once every action is decided (all), once any action is decided (any), or once 'quorum' actions are approved or can no longer be (quorum)",
+                        "default": "all"
+                    },
+                    "quorum": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Number of approvals required in quorum mode (default: a majority)"
+                    },
+                    "wait_for_response": {
+                        "type": "boolean",
+                        "description": "Whether to wait for user response (default: true)",
+                        "default": True
+                    },
+                    "timeout": {
+                        "type": "integer",
+                        "description": "Timeout in seconds to wait for responses (default: 1800 - 30 minutes)",
+                        "default": 1800
+                    }
+                },
+                "required": ["actions"]
+            }
+        ),
         Tool(
             name="send_notification",
             description="Send a general notification to the user",
@@ -70,18 +117,83 @@ def get_tools() -> list[Tool]:
                 "required": ["message"]
             }
         ),
+        Tool(
+            name="send_file",
+            description="Send one or more files (build logs, diffs, reports, images) to the user as Telegram documents. Several files are grouped into one message, up to 10 per message. Files are streamed from disk, up to 50 MB each.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "path": {
+                        "type": "string",
+                        "description": "Path of the file to send"
+                    },
+                    "paths": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Several files to send together"
+                    },
+                    "caption": {
+                        "type": "string",
+                        "description": "Text shown under the file(s)"
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="send_log_tail",
+            description="Send the last lines of a log or other text file to the user. Short tails arrive as messages; long ones are split over several messages or sent as a compressed attachment. Use this instead of pasting long output into send_notification.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "path": {
+                        "type": "string",
+                        "description": "Path of the text file"
+                    },
+                    "lines": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": 100000,
+                        "description": "Number of lines from the end of the file (default: 100)",
+                        "default": 100
+                    },
+                    "caption": {
+                        "type": "string",
+                        "description": "Text shown above the lines, e.g. what the log is from"
+                    }
+                },
+                "required": ["path"]
+            }
+        ),
         Tool(
             name="check_approval_status",
-            description="Check the status of a pending approval request by ID",
+            description="Check the status of one or more approval requests by ID. With wait_seconds, waits until one of the pending requests is decided instead of returning immediately, so there is no need to poll.",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "request_id": {
                         "type": "string",
                         "description": "The approval request ID to check"
+                    },
+                    "request_ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Several approval request IDs to check in one call"
+                    },
+                    "wait_seconds": {
+                        "type": "integer",
+                        "minimum": 0,
+                        "description": "Seconds to wait for any pending request in the list to be decided before returning (default: 0, return immediately)",
+                        "default": 0
                     }
-                },
-                "required": ["request_id"]
+                }
+            }
+        ),
+        Tool(
+            name="get_server_stats",
+            description="Get this server's performance metrics: per-tool latency, Telegram Bot API call timing and errors (including 429 flood limits), queue depths, pending approvals and how long humans take to decide. Metrics must be enabled with TELEGRAM_METRICS.",
+            inputSchema={
+                "type": "object",
+                "properties": {}
             }
         )
     ]